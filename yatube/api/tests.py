@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.posts = [Post.objects.create(author=cls.author, group=cls.group,
+                                         text='Пост %d' % number)
+                     for number in range(13)]
+        cls.post = cls.posts[-1]
+        for number in range(3):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text='Комментарий %d' % number)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get(self, url, client=None):
+        response, _ = self.assertWithinQueryBudget(
+            client or self.authorized_client, url)
+        return response
+
+    def walk(self, url):
+        """Все результаты, следуя ссылкам next."""
+        results = []
+        while url:
+            data = self.get(url).json()
+            results += data['results']
+            url = data['next']
+        return results
+
+    def test_feeds_return_all_posts_in_order(self):
+        expected = [post.id for post in reversed(self.posts)]
+        urls = [
+            reverse('api:index'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:profile_posts', args=[self.author.username]),
+            reverse('api:follow_posts'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                results = self.walk(url)
+                self.assertEqual([item['id'] for item in results], expected)
+                self.assertEqual(results[0], {
+                    'id': self.post.id,
+                    'text': self.post.text,
+                    'pub_date': results[0]['pub_date'],
+                    'author': 'author',
+                    'group': 'group',
+                    'image': None,
+                    'comments_count': 3,
+                })
+
+    def test_previous_link(self):
+        first = self.get(reverse('api:index') + '?limit=5').json()
+        second = self.get(first['next']).json()
+        self.assertEqual(
+            self.get(second['previous']).json()['results'],
+            first['results'])
+
+    def test_sparse_fields(self):
+        url = reverse('api:post_detail', args=[self.post.id])
+        data = self.get(url + '?fields=text,author').json()
+        self.assertEqual(data, {'text': self.post.text, 'author': 'author'})
+        response = self.get(url + '?fields=text,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_batch_keeps_requested_order(self):
+        ids = [self.posts[2].id, 10 ** 6, self.posts[0].id]
+        url = reverse('api:post_batch') + '?fields=id&ids=%s' % ','.join(
+            map(str, ids))
+        data = self.get(url).json()
+        self.assertEqual(data['results'],
+                         [{'id': ids[0]}, {'id': ids[2]}])
+        self.assertEqual(data['missing'], [10 ** 6])
+        response = self.get(reverse('api:post_batch') + '?ids=1,x')
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_comments(self):
+        url = reverse('api:post_comments', args=[self.post.id])
+        results = self.walk(url + '?limit=2&fields=text')
+        self.assertEqual([item['text'] for item in results],
+                         ['Комментарий 2', 'Комментарий 1', 'Комментарий 0'])
+
+    def test_not_found_and_unauthorized(self):
+        urls = {
+            reverse('api:post_detail', args=[10 ** 6]): 404,
+            reverse('api:post_comments', args=[10 ** 6]): 404,
+            reverse('api:group_posts', args=['missing']): 404,
+            reverse('api:profile_posts', args=['missing']): 404,
+            reverse('api:follow_posts'): 401,
+        }
+        for url, status in urls.items():
+            with self.subTest(url=url):
+                response = self.get(url, Client())
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
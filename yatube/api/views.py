@@ -0,0 +1,219 @@
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from core.decorators import query_budget
+from core.paginator import CursorPaginator, PER_PAGE
+from posts import timeline
+from posts.models import Comment, Group, Post, User
+
+MAX_LIMIT = 100
+MAX_BATCH = 100
+
+# Публичное имя поля -> поле для values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+    'post': 'post_id',
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_view(view):
+    """GET-only view, ошибки параметров превращаются в ответ 400."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as exc:
+            return error(str(exc))
+    return wrapper
+
+
+def selected_fields(request, available):
+    """Поля из ?fields=a,b (по умолчанию все) в порядке запроса."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(available)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise BadRequest('Неизвестные поля: %s' % ', '.join(unknown))
+    return list(dict.fromkeys(names))
+
+
+def projection(fields, available, keys=()):
+    """Поля для values(): выбранные плюс ключ сортировки."""
+    return list(dict.fromkeys(
+        [available[name] for name in fields] + list(keys)))
+
+
+def serialize(rows, fields, available):
+    items = []
+    for row in rows:
+        item = {name: row[available[name]] for name in fields}
+        if 'image' in item:
+            item['image'] = (default_storage.url(item['image'])
+                             if item['image'] else None)
+        items.append(item)
+    return items
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit') or PER_PAGE)
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def page_link(request, **params):
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    query.pop('page', None)
+    query.update(params)
+    return '%s?%s' % (request.path, query.urlencode())
+
+
+def page_response(request, page, fields, available):
+    next_link = previous_link = None
+    if page.next_cursor:
+        next_link = page_link(request, cursor=page.next_cursor)
+    if page.previous_cursor:
+        previous_link = page_link(request, cursor=page.previous_cursor)
+    elif page.previous_page_number:
+        previous_link = page_link(request, page=page.previous_page_number)
+    return JsonResponse({
+        'results': serialize(page, fields, available),
+        'next': next_link,
+        'previous': previous_link,
+    })
+
+
+def post_page(request, posts):
+    fields = selected_fields(request, POST_FIELDS)
+    rows = posts.values(*projection(fields, POST_FIELDS, ('pub_date', 'id')))
+    page = CursorPaginator(rows, page_size(request)).get_page(request.GET)
+    return page_response(request, page, fields, POST_FIELDS)
+
+
+@query_budget(1)
+@api_view
+def index(request):
+    return post_page(request, Post.objects.all())
+
+
+@query_budget(2)
+@api_view
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).values_list('id', flat=True)
+    if not group:
+        return error('Группа не найдена', status=404)
+    return post_page(request, Post.objects.filter(group_id=group[0]))
+
+
+@query_budget(2)
+@api_view
+def profile_posts(request, username):
+    author = User.objects.filter(
+        username=username).values_list('id', flat=True)
+    if not author:
+        return error('Пользователь не найден', status=404)
+    return post_page(request, Post.objects.filter(author_id=author[0]))
+
+
+@query_budget(6)
+@api_view
+def follow_posts(request):
+    """Лента подписок: ключи страницы из таблицы лент, затем сами посты
+    одним запросом по id.
+    """
+    if not request.user.is_authenticated:
+        return error('Требуется авторизация', status=401)
+    fields = selected_fields(request, POST_FIELDS)
+    columns = projection(fields, POST_FIELDS, ('id',))
+
+    def load(rows):
+        ids = [row['post_id'] for row in rows]
+        posts = {post['id']: post for post in Post.objects.filter(
+            id__in=ids).values(*columns)} if ids else {}
+        return [posts[row['post_id']] for row in rows
+                if row['post_id'] in posts]
+
+    sources = [source.values('pub_date', 'post_id')
+               for source in timeline.feed_sources(request.user)]
+    paginator = CursorPaginator(sources, page_size(request),
+                                ordering=('-pub_date', '-post_id'),
+                                transform=load)
+    page = paginator.get_page(request.GET)
+    return page_response(request, page, fields, POST_FIELDS)
+
+
+@query_budget(1)
+@api_view
+def post_detail(request, post_id):
+    fields = selected_fields(request, POST_FIELDS)
+    rows = Post.objects.filter(id=post_id).values(
+        *projection(fields, POST_FIELDS))
+    if not rows:
+        return error('Пост не найден', status=404)
+    return JsonResponse(serialize(rows, fields, POST_FIELDS)[0])
+
+
+@query_budget(2)
+@api_view
+def post_comments(request, post_id):
+    fields = selected_fields(request, COMMENT_FIELDS)
+    if not Post.objects.filter(id=post_id).exists():
+        return error('Пост не найден', status=404)
+    rows = Comment.objects.filter(post_id=post_id).values(
+        *projection(fields, COMMENT_FIELDS, ('created', 'id')))
+    page = CursorPaginator(rows, page_size(request),
+                           ordering=('-created', '-id')).get_page(request.GET)
+    return page_response(request, page, fields, COMMENT_FIELDS)
+
+
+@query_budget(1)
+@api_view
+def post_batch(request):
+    """Несколько постов за один запрос: ?ids=3,1,2, в порядке ids."""
+    try:
+        ids = [int(value) for value in
+               request.GET.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        raise BadRequest('ids должны быть числами')
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise BadRequest('Не указаны ids')
+    if len(ids) > MAX_BATCH:
+        raise BadRequest('Не больше %d ids за запрос' % MAX_BATCH)
+    fields = selected_fields(request, POST_FIELDS)
+    rows = Post.objects.filter(id__in=ids).values(
+        *projection(fields, POST_FIELDS, ('id',)))
+    found = {row['id']: row for row in rows}
+    return JsonResponse({
+        'results': serialize([found[id] for id in ids if id in found],
+                             fields, POST_FIELDS),
+        'missing': [id for id in ids if id not in found],
+    })
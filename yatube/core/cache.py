@@ -0,0 +1,360 @@
+"""Кэш, общий для всех воркеров.
+
+TwoLevelCache держит LRU в памяти процесса (L1) перед общим хранилищем
+(L2, по умолчанию SqliteCache). Запись идет в L2 вместе с новой меткой
+ключа; процесс раз в CHECK_INTERVAL секунд читает метки ключей своего L1
+и отбрасывает записи, метки которых сменились. Чужая запись видна не
+позже чем через CHECK_INTERVAL, своя — сразу, а записи других ключей
+L1 не трогают.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from .metrics import Counter, registry
+
+MISSING = object()
+EVENTS = ('l1_hit', 'l2_hit', 'miss', 'eviction', 'stale')
+
+events = registry.add(Counter(
+    'yatube_cache_events_total', 'Обращения к двухуровневому кэшу.',
+    ('cache', 'event')))
+
+
+def _dumps(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+class SqliteCache(BaseCache):
+    """Кэш в отдельном файле SQLite в режиме WAL.
+
+    Соединение свое у каждого потока и процесса (после fork создается
+    заново). Просроченные записи удаляются при чтении и при чистке,
+    которая запускается раз в CULL_EVERY записей.
+    """
+    CULL_EVERY = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=wal')
+            connection.execute('PRAGMA synchronous=normal')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+                'value BLOB NOT NULL, expires REAL) WITHOUT ROWID')
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _fetch(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._connection().execute(
+            'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+            % ','.join('?' * len(keys)), list(keys))
+        return {key: pickle.loads(value) for key, value, expires in rows
+                if expires is None or expires > now}
+
+    def _store(self, items, timeout, replace=True):
+        expires = self.get_backend_timeout(timeout)
+        connection = self._connection()
+        if expires == -1:
+            connection.executemany('DELETE FROM cache WHERE key = ?',
+                                   [(key,) for key in items])
+            return 0
+        rows = [(key, _dumps(value), expires) for key, value in items.items()]
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            if replace:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)', rows)
+                stored = len(rows)
+            else:
+                connection.executemany(
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    [(key, time.time()) for key in items])
+                stored = connection.executemany(
+                    'INSERT OR IGNORE INTO cache VALUES (?, ?, ?)',
+                    rows).rowcount
+        self._writes += 1
+        if self._writes % self.CULL_EVERY == 0:
+            self._cull()
+        return stored
+
+    def _cull(self):
+        connection = self._connection()
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,))
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        names = {self._key(key, version): key for key in keys}
+        return {names[name]: value
+                for name, value in self._fetch(list(names)).items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store({self._key(key, version): value}, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store({self._key(key, version): value
+                     for key, value in data.items()}, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self._store({self._key(key, version): value}, timeout,
+                                replace=False))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        return self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (expires, self._key(key, version), time.time())).rowcount > 0
+
+    def delete(self, key, version=None):
+        self._connection().execute('DELETE FROM cache WHERE key = ?',
+                                   (self._key(key, version),))
+
+    def delete_many(self, keys, version=None):
+        self._connection().executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [(self._key(key, version),) for key in keys])
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class LocalStore:
+    """L1 процесса: общий для всех потоков, как LocMemCache."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.checked = float('-inf')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class TwoLevelCache(BaseCache):
+    """LRU процесса (L1) перед общим кэшем (L2).
+
+    OPTIONS: L1_MAX_ENTRIES — размер L1, CHECK_INTERVAL — как часто
+    сверять метки, L2_BACKEND — класс L2; остальные параметры передаются
+    L2. В L2 вместе со значением лежит срок его жизни, чтобы L1 не держал
+    запись дольше L2, а рядом — метка записи с тем же сроком.
+    """
+    STAMP_PREFIX = 'l1-stamp:'
+    # Сколько меток читать одним запросом при сверке.
+    CHECK_CHUNK = 500
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.l1_max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        self.check_interval = options.pop('CHECK_INTERVAL', 1)
+        backend = import_string(options.pop(
+            'L2_BACKEND', 'core.cache.SqliteCache'))
+        super().__init__({**params, 'OPTIONS': {}})
+        self.name = location
+        self.l2 = backend(location, {**params, 'OPTIONS': options})
+        with _stores_lock:
+            self._local = _stores.setdefault(location, LocalStore())
+
+    def _event(self, name, amount=1):
+        events.inc(self.name, name, amount=amount)
+
+    def stats(self):
+        return {name: events.values.get((self.name, name), 0)
+                for name in EVENTS}
+
+    def _stamp_key(self, name):
+        return self.STAMP_PREFIX + name
+
+    def _refresh(self):
+        """Отбрасывает записи L1, метки которых в L2 сменились или пропали."""
+        local = self._local
+        now = time.monotonic()
+        if now - local.checked < self.check_interval:
+            return
+        local.checked = now
+        with local.lock:
+            entries = list(local.entries.items())
+        stale = 0
+        for start in range(0, len(entries), self.CHECK_CHUNK):
+            chunk = entries[start:start + self.CHECK_CHUNK]
+            stamps = self.l2.get_many(
+                [self._stamp_key(name) for name, _ in chunk])
+            with local.lock:
+                for name, entry in chunk:
+                    if (stamps.get(self._stamp_key(name)) != entry[2]
+                            and local.entries.get(name) is entry):
+                        del local.entries[name]
+                        stale += 1
+        if stale:
+            self._event('stale', stale)
+
+    def _stamp(self, names, timeout):
+        """Новые метки записанных ключей: L1 других процессов отбросят
+        старые значения при сверке.
+        """
+        stamps = {name: uuid.uuid4().hex for name in names}
+        self.l2.set_many({self._stamp_key(name): stamp
+                          for name, stamp in stamps.items()}, timeout)
+        return stamps
+
+    def _local_get(self, key):
+        local = self._local
+        with local.lock:
+            entry = local.entries.get(key)
+            if entry is None:
+                return MISSING
+            pickled, expires, _ = entry
+            if expires is not None and expires <= time.time():
+                del local.entries[key]
+                stale = True
+            else:
+                local.entries.move_to_end(key)
+                stale = False
+        self._event('stale' if stale else 'l1_hit')
+        return MISSING if stale else pickle.loads(pickled)
+
+    def _local_set(self, key, value, expires, stamp, replace=True):
+        if stamp is None or expires is not None and expires <= time.time():
+            return
+        entry = (_dumps(value), expires, stamp)
+        local = self._local
+        evicted = 0
+        with local.lock:
+            if not replace and key in local.entries:
+                return
+            local.entries[key] = entry
+            local.entries.move_to_end(key)
+            while len(local.entries) > self.l1_max_entries:
+                local.entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._event('eviction', evicted)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._refresh()
+        found = {}
+        missing = {}
+        for key in keys:
+            name = self._key(key, version)
+            value = self._local_get(name)
+            if value is MISSING:
+                missing[key] = name
+            else:
+                found[key] = value
+        if missing:
+            checked = self._local.checked
+            # Метки читаются раньше значений: значение новее метки лишь
+            # отбросится при сверке, старое с новой меткой не сохранится.
+            stamps = self.l2.get_many(
+                [self._stamp_key(name) for name in missing.values()])
+            stored = self.l2.get_many(list(missing), version)
+            for key, (expires, value) in stored.items():
+                name = missing[key]
+                # Запись этого процесса, сделанная во время чтения, новее.
+                self._local_set(name, value, expires,
+                                stamps.get(self._stamp_key(name)),
+                                replace=False)
+                found[key] = value
+            if self._local.checked != checked:
+                # Сверка прошла во время чтения и не видела этих записей.
+                self._local.checked = float('-inf')
+            self._event('l2_hit', len(stored))
+            if len(stored) < len(missing):
+                self._event('miss', len(missing) - len(stored))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self.l2.set_many({key: (expires, value)
+                          for key, value in data.items()}, timeout, version)
+        names = {key: self._key(key, version) for key in data}
+        stamps = self._stamp(names.values(), timeout)
+        for key, value in data.items():
+            self._local_set(names[key], value, expires, stamps[names[key]])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        if not self.l2.add(key, (expires, value), timeout, version):
+            return False
+        name = self._key(key, version)
+        stamp = self._stamp([name], timeout)[name]
+        self._local_set(name, value, expires, stamp)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.l2.get(key, MISSING, version)
+        if value is MISSING:
+            return False
+        self.set(key, value[1], timeout, version)
+        return True
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version)
+        names = [self._key(key, version) for key in keys]
+        self.l2.delete_many([self._stamp_key(name) for name in names])
+        with self._local.lock:
+            for name in names:
+                self._local.entries.pop(name, None)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self):
+        self.l2.clear()
+        with self._local.lock:
+            self._local.entries.clear()
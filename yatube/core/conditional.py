@@ -0,0 +1,28 @@
+import calendar
+import hashlib
+
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Сильный ETag из значений, от которых зависит содержимое страницы."""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return '"%s"' % digest
+
+
+def conditional_render(request, template, context, etag,
+                       last_modified=None):
+    """render() с ETag/Last-Modified; 304 отдается до рендера шаблона."""
+    timestamp = None
+    if last_modified is not None:
+        timestamp = calendar.timegm(last_modified.utctimetuple())
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=timestamp)
+    if response is None:
+        response = render(request, template, context)
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
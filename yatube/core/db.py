@@ -0,0 +1,87 @@
+import contextlib
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_thread_lock = threading.Lock()
+_local = threading.local()
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: PRAGMA из settings.SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+def lock_path(connection):
+    if connection.is_in_memory_db():
+        return None
+    return (getattr(settings, 'SQLITE_WRITE_LOCK', None)
+            or '%s.write-lock' % connection.settings_dict['NAME'])
+
+
+@contextlib.contextmanager
+def write_lock(using='default'):
+    """Один писатель на базу SQLite среди потоков и процессов.
+
+    В режиме WAL читатели не ждут писателя, а писатели, выстроенные
+    в очередь, не получают database is locked при повышении блокировки
+    внутри транзакции. Вложенные вызовы в одном потоке не блокируются.
+    """
+    connection = connections[using]
+    if (connection.vendor != 'sqlite'
+            or not settings.SQLITE_SERIALIZE_WRITES
+            or getattr(_local, 'depth', 0)):
+        yield
+        return
+    path = lock_path(connection) if fcntl is not None else None
+    with _thread_lock:
+        _local.depth = 1
+        try:
+            if path is None:
+                yield
+            else:
+                with open(path, 'a') as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    yield
+        finally:
+            _local.depth = 0
+
+
+def is_locked(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+def serialized(func):
+    """Выполняет func в одной транзакции под write_lock().
+
+    Транзакция, получившая database is locked (например, от записи вне
+    очереди), откатывается и повторяется до SQLITE_WRITE_RETRIES раз.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                with write_lock(), transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                attempt += 1
+                if (not is_locked(error)
+                        or attempt > settings.SQLITE_WRITE_RETRIES):
+                    raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+    return wrapper
@@ -0,0 +1,10 @@
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов view может выполнить за запрос.
+
+    Бюджет не зависит от размера страницы; его проверяют тесты через
+    core.testing.QueryBudgetMixin.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
@@ -0,0 +1,172 @@
+"""Легковесные метрики запросов в текстовом формате Prometheus.
+
+Значения хранятся в памяти процесса; каждый воркер отдает свои.
+"""
+import bisect
+import threading
+import time
+
+from django.template.backends import django as django_backend
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_local = threading.local()
+
+
+def _format_labels(labels):
+    return ','.join('%s="%s"' % (name, str(value).replace('"', '\\"'))
+                    for name, value in labels)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = (
+                self.values.get(label_values, 0) + amount)
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for label_values, value in sorted(values.items()):
+            labels = _format_labels(zip(self.labels, label_values))
+            yield '%s{%s} %s' % (self.name, labels, value)
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels, buckets):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(label_values)
+            if state is None:
+                state = self.values[label_values] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(counts), total, count)
+                      for key, (counts, total, count) in self.values.items()}
+        for label_values, (counts, total, count) in sorted(values.items()):
+            labels = list(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                yield '%s_bucket{%s} %d' % (
+                    self.name, _format_labels(labels + [('le', bound)]),
+                    cumulative)
+            yield '%s_sum{%s} %s' % (self.name, _format_labels(labels), total)
+            yield '%s_count{%s} %d' % (self.name, _format_labels(labels),
+                                       count)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP %s %s' % (metric.name, metric.help))
+            lines.append('# TYPE %s %s' % (metric.name, metric.kind))
+            lines.extend(metric.samples())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+requests_total = registry.add(Counter(
+    'yatube_http_requests_total', 'Обработанные запросы.',
+    ('view', 'method', 'status')))
+request_seconds = registry.add(Histogram(
+    'yatube_http_request_duration_seconds', 'Время обработки запроса.',
+    ('view',), LATENCY_BUCKETS))
+db_queries = registry.add(Histogram(
+    'yatube_db_queries_per_request', 'SQL-запросов на запрос.',
+    ('view',), QUERY_BUCKETS))
+db_seconds = registry.add(Histogram(
+    'yatube_db_duration_seconds', 'Время SQL-запросов за запрос.',
+    ('view',), LATENCY_BUCKETS))
+template_seconds = registry.add(Histogram(
+    'yatube_template_render_seconds', 'Время рендеринга шаблонов.',
+    ('view',), LATENCY_BUCKETS))
+response_bytes = registry.add(Histogram(
+    'yatube_http_response_size_bytes', 'Размер тела ответа.',
+    ('view',), SIZE_BUCKETS))
+
+
+class RequestStats:
+    """Собирает SQL и шаблоны одного запроса (execute_wrapper)."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+def set_current_stats(stats):
+    _local.stats = stats
+
+
+def install_template_timer():
+    """Оборачивает Template.render бэкенда Django для замера шаблонов.
+
+    Замеряется только внешний рендер: вложенные (include, карточки
+    {% post_cards %}) уже входят в его время и отдельно не считаются.
+    """
+    template_class = django_backend.Template
+    if getattr(template_class.render, 'timed', False):
+        return
+    original = template_class.render
+
+    def render(self, *args, **kwargs):
+        stats = current_stats()
+        if stats is None or stats.template_depth:
+            return original(self, *args, **kwargs)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+            stats.template_depth -= 1
+
+    render.timed = True
+    template_class.render = render
@@ -0,0 +1,39 @@
+import time
+
+from django.db import connection
+
+from . import metrics
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """Снимает метрики каждого запроса, помеченные именем маршрута."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.install_template_timer()
+
+    def __call__(self, request):
+        stats = metrics.RequestStats()
+        metrics.set_current_stats(stats)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats):
+                response = self.get_response(request)
+        finally:
+            metrics.set_current_stats(None)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        # Имя маршрута, а не путь: число меток ограничено числом URL.
+        view = match.view_name if match else 'unmatched'
+        # Выдуманные клиентом методы не порождают новых серий.
+        method = request.method if request.method in METHODS else 'other'
+        metrics.requests_total.inc(view, method, response.status_code)
+        metrics.request_seconds.observe(elapsed, view)
+        metrics.db_queries.observe(stats.queries, view)
+        metrics.db_seconds.observe(stats.db_seconds, view)
+        metrics.template_seconds.observe(stats.template_seconds, view)
+        if not response.streaming:
+            metrics.response_bytes.observe(len(response.content), view)
+        return response
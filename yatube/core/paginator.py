@@ -0,0 +1,269 @@
+import base64
+import datetime
+import json
+
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+PER_PAGE = 10
+# Номера страниц (?page=N) поддерживаются только для первых страниц,
+# чтобы старые ссылки продолжали работать; дальше — только курсоры.
+PAGE_NUMBER_LIMIT = 5
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает микросекунды, а курсору нужна точность.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage:
+    """Страница ленты без COUNT(*): знает только соседей."""
+
+    def __init__(self, paginator, cursor=None, number=None):
+        self.paginator = paginator
+        self.cursor = cursor
+        self.number = number
+        self._object_list = None
+        self._has_next = False
+        self._has_previous = False
+        self._first_key = self._last_key = None
+
+    def _fetch(self):
+        if self._object_list is not None:
+            return
+        paginator = self.paginator
+        per_page = paginator.per_page
+        if self.number is not None:
+            offset = (self.number - 1) * per_page
+            rows = paginator.fetch(limit=offset + per_page + 1)[offset:]
+            self._has_next = len(rows) > per_page
+            self._has_previous = self.number > 1
+            rows = rows[:per_page]
+        elif self.cursor is None or not self.cursor[1]:
+            cursor = self.cursor and self.cursor[0]
+            rows = paginator.fetch(cursor, limit=per_page + 1)
+            self._has_next = len(rows) > per_page
+            self._has_previous = self.cursor is not None
+            rows = rows[:per_page]
+        else:
+            rows = paginator.fetch(self.cursor[0], reverse=True,
+                                   limit=per_page + 1)
+            self._has_previous = len(rows) > per_page
+            self._has_next = True
+            rows = rows[:per_page][::-1]
+        if rows:
+            self._first_key = paginator.key_of(rows[0])
+            self._last_key = paginator.key_of(rows[-1])
+        if paginator.transform is not None:
+            rows = paginator.transform(rows)
+        self._object_list = rows
+
+    @property
+    def object_list(self):
+        self._fetch()
+        return self._object_list
+
+    def __repr__(self):
+        return '<CursorPage %s>' % self.token
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def token(self):
+        """Строка, однозначно задающая страницу (для ключей кэша)."""
+        if self.cursor is not None:
+            return self.paginator.encode(*self.cursor)
+        return str(self.number or 1)
+
+    def has_next(self):
+        self._fetch()
+        return self._has_next
+
+    def has_previous(self):
+        self._fetch()
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode(self._last_key)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        if self.number is not None and self.number > 1:
+            return None
+        return self.paginator.encode(self._first_key, reverse=True)
+
+    @property
+    def previous_page_number(self):
+        if self.number is not None and self.number > 1:
+            return self.number - 1
+        return None
+
+
+class CursorPaginator:
+    """Keyset-пагинация по набору полей, например ('-pub_date', '-id').
+
+    Курсор хранит значения ключа последней (или первой) записи страницы,
+    поэтому следующая страница — это диапазонное чтение по индексу
+    без OFFSET и без подсчета общего числа записей.
+
+    Вместо одного queryset можно передать список: каждый читается
+    своим диапазоном, а результаты сливаются по ключу (поля ключа должны
+    быть у всех источников и сортироваться в одном направлении).
+    transform, если задан, превращает строки страницы в объекты
+    для шаблона уже после того, как из них взяты ключи курсоров.
+    """
+
+    def __init__(self, queryset, per_page=PER_PAGE,
+                 ordering=('-pub_date', '-id'),
+                 page_number_limit=PAGE_NUMBER_LIMIT,
+                 transform=None):
+        if isinstance(queryset, (list, tuple)):
+            self.sources = list(queryset)
+        else:
+            self.sources = [queryset]
+        self.queryset = self.sources[0]
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.page_number_limit = page_number_limit
+        self.transform = transform
+
+    @property
+    def fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def ordered(self, queryset, reverse=False):
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else '-' + name
+                        for name in ordering]
+        return queryset.order_by(*ordering)
+
+    def fetch(self, cursor=None, reverse=False, limit=None):
+        """Первые limit строк после курсора в порядке сортировки."""
+        rows = []
+        for source in self.sources:
+            queryset = self.ordered(source, reverse)
+            if cursor is not None:
+                queryset = queryset.filter(self.after(cursor, reverse))
+            rows.extend(queryset[:limit])
+        if len(self.sources) > 1:
+            descending = self.ordering[0].startswith('-') != reverse
+            rows.sort(key=lambda row: self.key_of(row), reverse=descending)
+            seen = set()
+            unique = []
+            for row in rows:
+                key = tuple(self.key_of(row))
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(row)
+            rows = unique[:limit]
+        return rows
+
+    def after(self, values, reverse=False):
+        """Условие «строго после курсора» в порядке сортировки."""
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            field = name.lstrip('-')
+            lookup = '%s__%s' % (field, 'lt' if descending else 'gt')
+            step = Q(**{lookup: values[index]})
+            for previous, value in zip(self.fields[:index], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def key_of(self, obj):
+        if isinstance(obj, dict):
+            return [obj[field] for field in self.fields]
+        return [getattr(obj, field) for field in self.fields]
+
+    def encode(self, values, reverse=False):
+        payload = json.dumps([list(values), int(reverse)],
+                             cls=CursorEncoder,
+                             separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode())
+        return token.decode().rstrip('=')
+
+    def decode(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values, reverse = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode())
+            if len(values) != len(self.fields):
+                raise InvalidCursor(token)
+            values = self.convert(values)
+        except InvalidCursor:
+            raise
+        except Exception:
+            raise InvalidCursor(token)
+        return values, bool(reverse)
+
+    def convert(self, values):
+        """Значения ключа из JSON в типы полей модели."""
+        model = self.queryset.model
+        return [model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)]
+
+    def get_page(self, params):
+        """Страница по GET-параметрам: ?cursor=<token> или ?page=N."""
+        token = params.get('cursor')
+        if token:
+            try:
+                return CursorPage(self, cursor=self.decode(token))
+            except InvalidCursor:
+                pass
+        try:
+            number = int(params.get('page') or 1)
+        except (TypeError, ValueError):
+            number = 1
+        if not 1 <= number <= self.page_number_limit:
+            number = 1
+        return CursorPage(self, number=number)
+
+
+def paginate(request, queryset, per_page=PER_PAGE, **kwargs):
+    return CursorPaginator(queryset, per_page, **kwargs).get_page(
+        request.GET)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц в админке.
+
+    Без фильтров число строк оценивается по максимальному первичному
+    ключу (удаления дают завышенную оценку), с фильтрами считается
+    не дальше ESTIMATE_LIMIT строк.
+    """
+    ESTIMATE_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return queryset.order_by().aggregate(
+                estimate=Max('pk'))['estimate'] or 0
+        return queryset.order_by().values('pk')[
+            :self.ESTIMATE_LIMIT].count()
@@ -0,0 +1,91 @@
+"""Сессии с чтением из кэша и отложенным продлением срока.
+
+Данные сессии (вход, выход, изменения) пишутся в кэш и в базу сразу,
+как в cached_db. Сохранение без изменений, то есть только продление
+срока при SESSION_SAVE_EVERY_REQUEST, ничего не пишет, пока не прошла
+половина срока сессии с прошлой записи. Потом оно обновляет кэш, а в
+базу попадает пачкой: одним UPDATE на SESSION_FLUSH_SIZE сессий или
+раз в SESSION_FLUSH_INTERVAL секунд. Потеря непереданных продлений при
+остановке процесса только возвращает сессиям прежний срок.
+
+Вместе с каждой пачкой удаляется не больше SESSION_PRUNE_BATCH
+истекших сессий, так что полный проход clearsessions не нужен.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.models import Session
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .db import serialized
+
+# Время последней записи сессии; хранится в ее данных.
+REFRESHED_KEY = '_session_refreshed'
+
+_pending = {}
+_lock = threading.Lock()
+_flushed = time.monotonic()
+
+
+def touch(session_key, expire_date):
+    """Запоминает новый срок сессии; повторные продления сливаются."""
+    with _lock:
+        _pending[session_key] = expire_date
+        due = (len(_pending) >= settings.SESSION_FLUSH_SIZE
+               or time.monotonic() - _flushed
+               >= settings.SESSION_FLUSH_INTERVAL)
+    if due:
+        flush()
+
+
+def flush():
+    """Записывает накопленные сроки одним UPDATE и подчищает истекшие."""
+    global _flushed
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed = time.monotonic()
+    if pending:
+        _write(pending)
+    return prune()
+
+
+@serialized
+def _write(pending):
+    Session.objects.filter(pk__in=pending).update(expire_date=Case(
+        *[When(pk=key, then=Value(expire_date))
+          for key, expire_date in pending.items()],
+        output_field=DateTimeField()))
+
+
+@serialized
+def prune(batch_size=None):
+    """Удаляет до batch_size истекших сессий по индексу expire_date."""
+    expired = list(Session.objects.filter(expire_date__lt=timezone.now())
+                   .values_list('pk', flat=True)
+                   [:batch_size or settings.SESSION_PRUNE_BATCH])
+    if not expired:
+        return 0
+    return Session.objects.filter(pk__in=expired).delete()[0]
+
+
+class SessionStore(cached_db.SessionStore):
+    def save(self, must_create=False):
+        now = int(time.time())
+        if must_create or self.modified or self.session_key is None:
+            self._get_session(no_load=must_create)[REFRESHED_KEY] = now
+            return super().save(must_create)
+        session = self._session
+        if now - session.get(REFRESHED_KEY, 0) < self.get_expiry_age() / 2:
+            return
+        session[REFRESHED_KEY] = now
+        self._cache.set(self.cache_key, session, self.get_expiry_age())
+        touch(self.session_key, self.get_expiry_date())
+
+    @classmethod
+    def clear_expired(cls):
+        while prune():
+            pass
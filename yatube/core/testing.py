@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+
+
+@contextmanager
+def temporary_caches():
+    """Кэши во временном каталоге на время блока: общий файл кэша
+    запущенного сервера не читается, не пишется и не очищается.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    try:
+        with override_settings(CACHES={
+                alias: {**params,
+                        'LOCATION': os.path.join(directory, alias)}
+                for alias, params in settings.CACHES.items()}):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class QueryBudgetMixin:
+    """Проверка объявленного через @query_budget числа запросов view."""
+
+    def assertWithinQueryBudget(self, client, url):
+        view = resolve(url.split('?')[0]).func
+        budget = getattr(view, 'query_budget', None)
+        if budget is None:
+            self.fail('У view для %s не объявлен query_budget' % url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        executed = [query['sql'] for query in queries.captured_queries]
+        self.assertLessEqual(
+            len(executed), budget,
+            '%s: %d запросов при бюджете %d:\n%s'
+            % (url, len(executed), budget, '\n'.join(executed)))
+        return response, len(executed)
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты работают с временными кэшами (temporary_caches)."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches = ExitStack()
+        self.caches.enter_context(temporary_caches())
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.close()
+        super().teardown_test_environment(**kwargs)
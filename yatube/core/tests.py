@@ -0,0 +1,251 @@
+import os
+import shutil
+import tempfile
+import datetime
+import itertools
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics, sessions
+from .cache import LocalStore, TwoLevelCache
+from .db import serialized
+from .metrics import registry
+
+
+class MetricsTests(TestCase):
+    def test_metrics_are_labelled_by_route_name(self):
+        """Метрики помечены именем маршрута и отдаются в формате Prometheus.
+        """
+        client = Client()
+        client.get(reverse('posts:index'))
+        client.get('/no-such-page/')
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('yatube_http_requests_total{view="posts:index",'
+                      'method="GET",status="200"}', body)
+        self.assertIn('view="unmatched"', body)
+        self.assertNotIn('no-such-page', body)
+        self.assertIn('yatube_db_queries_per_request_count'
+                      '{view="posts:index"}', body)
+        self.assertIn('yatube_template_render_seconds_bucket'
+                      '{view="posts:index",le="+Inf"}', body)
+
+    def test_unknown_methods_share_a_label(self):
+        client = Client()
+        client.generic('BREW', reverse('posts:index'))
+        body = client.get(reverse('metrics')).content.decode()
+        self.assertIn('method="other"', body)
+        self.assertNotIn('BREW', body)
+
+    def test_nested_renders_are_timed_once(self):
+        metrics.install_template_timer()
+        inner = engines['django'].from_string('карточка')
+        outer = engines['django'].from_string('{{ card }}')
+        stats = metrics.RequestStats()
+        metrics.set_current_stats(stats)
+        self.addCleanup(metrics.set_current_stats, None)
+        # Каждый вызов часов прибавляет секунду.
+        with mock.patch.object(metrics.time, 'perf_counter',
+                               side_effect=itertools.count()):
+            outer.render({'card': inner.render})
+        self.assertEqual(stats.template_seconds, 1)
+
+    @override_settings(INTERNAL_IPS=[])
+    def test_metrics_are_internal(self):
+        response = Client().get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+
+class SqliteTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA %s' % name)
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'), -20000)
+
+    @override_settings(SQLITE_WRITE_RETRIES=2)
+    def test_serialized_retries_locked_transactions(self):
+        calls = []
+
+        @serialized
+        def view(request):
+            calls.append(request)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        self.assertEqual(view(request).status_code, 200)
+        self.assertEqual(len(calls), 3)
+        calls.clear()
+        with override_settings(SQLITE_WRITE_RETRIES=1):
+            with self.assertRaises(OperationalError):
+                view(request)
+
+
+class TwoLevelCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        cache = TwoLevelCache(self.location, {
+            'OPTIONS': {'CHECK_INTERVAL': 60, **options}})
+        # Отдельный L1, как у другого воркера с тем же L2.
+        cache._local = LocalStore()
+        return cache
+
+    def test_reads_are_served_from_l1(self):
+        self.cache.set('key', {'value': 1})
+        self.cache.get('key')['value'] = 2
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertEqual(self.cache.get_many(['key', 'other']),
+                         {'key': {'value': 1}})
+        self.assertFalse(self.cache.add('key', 3))
+        self.assertTrue(self.cache.add('new', 3, timeout=0.05))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('new'))
+        stats = self.cache.stats()
+        self.assertEqual(stats['l1_hit'], 3)
+        self.assertEqual(stats['miss'], 2)
+
+    def test_other_process_sees_changes_after_check_interval(self):
+        other = self.make_cache()
+        self.cache.set('key', 'old')
+        self.assertEqual(other.get('key'), 'old')
+        self.cache.set('key', 'new')
+        self.assertEqual(other.get('key'), 'old')
+        other._local.checked = float('-inf')
+        self.assertEqual(other.get('key'), 'new')
+        self.assertEqual(other.stats()['stale'], 1)
+        self.cache.delete('key')
+        other._local.checked = float('-inf')
+        self.assertIsNone(other.get('key'))
+        other.set('key', 'again')
+        self.cache.clear()
+        other._local.checked = float('-inf')
+        self.assertIsNone(other.get('key'))
+
+    def test_unrelated_writes_keep_l1(self):
+        other = self.make_cache()
+        self.cache.set_many({'card:%d' % number: number
+                             for number in range(200)})
+        self.assertEqual(other.get('card:0'), 0)
+        self.cache.set_many({'feed-version:%d' % number: number
+                             for number in range(200)})
+        other._local.checked = float('-inf')
+        self.assertEqual(other.get('card:0'), 0)
+        self.assertEqual(other.stats()['l1_hit'], 1)
+
+    def test_refresh_during_l2_read_does_not_keep_old_value(self):
+        other = self.make_cache()
+        self.cache.set('key', 'old')
+        other._refresh()
+        read = other.l2.get_many
+        calls = []
+
+        def racing_read(keys, version=None):
+            found = read(keys, version)
+            if keys == ['key'] and not calls:
+                calls.append(keys)
+                # Пока этот поток читал, другой процесс записал ключ,
+                # а другой поток уже сверил метки.
+                self.cache.set('key', 'new')
+                other._local.checked = float('-inf')
+                other._refresh()
+            return found
+
+        with mock.patch.object(other.l2, 'get_many', racing_read):
+            self.assertEqual(other.get('key'), 'old')
+        self.assertEqual(other.get('key'), 'new')
+
+    def test_tests_do_not_share_server_cache(self):
+        self.assertNotEqual(caches['default'].l2.path,
+                            os.path.join(settings.BASE_DIR, 'cache.sqlite3'))
+
+    def test_l1_is_bounded(self):
+        cache = self.make_cache(L1_MAX_ENTRIES=2)
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(cache.stats()['eviction'], 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['l2_hit'], 1)
+        self.assertIn('yatube_cache_events_total{cache="%s",event="eviction"}'
+                      % self.location, registry.exposition())
+
+
+class SessionTests(TestCase):
+    def setUp(self):
+        sessions._pending.clear()
+        self.client = Client()
+        self.client.force_login(
+            get_user_model().objects.create_user(username='visitor'))
+        self.key = self.client.session.session_key
+
+    def session_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return [query['sql'] for query in queries.captured_queries
+                if 'django_session' in query['sql']]
+
+    @override_settings(SESSION_FLUSH_SIZE=2)
+    def test_expiry_updates_are_batched(self):
+        Session.objects.filter(pk=self.key).update(
+            expire_date=timezone.now() + datetime.timedelta(hours=1))
+        cache_sets = mock.patch.object(caches['default'], 'set_many',
+                                       wraps=caches['default'].set_many)
+        with cache_sets as set_many:
+            self.assertEqual(self.session_queries(reverse('posts:index')),
+                             [])
+        self.assertEqual(sessions._pending, {})
+        session_sets = [call for call in set_many.call_args_list
+                        if 'django.contrib.sessions' in str(call)]
+        self.assertEqual(session_sets, [])
+        other = Client()
+        other.force_login(get_user_model().objects.create_user(
+            username='other'))
+        # Прошло больше половины срока сессий.
+        later = mock.Mock(wraps=time)
+        later.time.return_value = time.time() + 8 * 24 * 60 * 60
+        with mock.patch.object(sessions, 'time', later):
+            for _ in range(2):
+                self.assertEqual(
+                    self.session_queries(reverse('posts:index')), [])
+            self.assertEqual(list(sessions._pending), [self.key])
+            other.get(reverse('posts:index'))
+        self.assertEqual(sessions._pending, {})
+        expire_date = Session.objects.get(pk=self.key).expire_date
+        self.assertGreater(expire_date,
+                           timezone.now() + datetime.timedelta(days=13))
+        self.assertTrue(self.client.get(reverse('posts:follow_index'))
+                        .context['user'].is_authenticated)
+
+    def test_expired_sessions_are_pruned_in_batches(self):
+        for _ in range(3):
+            store = sessions.SessionStore()
+            store['value'] = 1
+            store.create()
+        Session.objects.exclude(pk=self.key).update(
+            expire_date=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(sessions.prune(batch_size=2), 2)
+        sessions.SessionStore.clear_expired()
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)),
+                         [self.key])
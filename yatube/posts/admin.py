@@ -1,8 +1,17 @@
 from django.contrib import admin
+from django.db.models import Q
+
+from core.paginator import EstimatedCountPaginator
 from .models import Group, Post, Comment
+from .search import comments_index, match_query, posts_index
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -11,10 +20,19 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not posts_index.available or not match_query(search_term):
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        return queryset.filter(
+            pk__in=posts_index.matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -27,17 +45,29 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = (
         'post',
         'author',
         'text',
         'created',
     )
-    search_fields = ('post',)
-    list_filter = ('post',)
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('author',)
+    search_fields = ('text', '=author__username')
+    list_filter = ('created',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Текст ищется по индексу FTS5, автор — точно по username."""
+        if not comments_index.available or not match_query(search_term):
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        return queryset.filter(
+            Q(pk__in=comments_index.matching_ids(search_term))
+            | Q(author__username=search_term.strip())), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
@@ -0,0 +1,56 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'feed-version:%s'
+
+
+def _new_version():
+    # Случайная версия не повторяется даже после вытеснения ключа из кэша,
+    # поэтому старые фрагменты не могут снова стать актуальными.
+    return uuid.uuid4().hex[:12]
+
+
+def feed_version(scope):
+    key = VERSION_KEY % scope
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def feed_versions(scopes):
+    """Версии нескольких лент: {scope: version} за одно чтение кэша."""
+    keys = {VERSION_KEY % scope: scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump(*scopes):
+    cache.set_many({VERSION_KEY % scope: _new_version() for scope in scopes},
+                   None)
+
+
+def post_scopes(post, group_ids=()):
+    """Ленты, в которых показывается пост."""
+    scopes = {'index', 'profile:%s' % post.author_id}
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            scopes.add('group:%s' % group_id)
+    return scopes
+
+
+def feed_cache(scope, page_obj):
+    """Контекст для {% cache feed_cache_timeout feed feed_cache_key %}."""
+    return {
+        'feed_cache_key': '%s:%s:%s' % (scope, feed_version(scope),
+                                        page_obj.token),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _count(model, field):
+    """Коррелированный подзапрос COUNT(*) по внешнему ключу field."""
+    counted = (model.objects.filter(**{field: OuterRef('pk')})
+               .order_by().values(field)
+               .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def change_user(user_id, counter, delta):
+    """Атомарно сдвигает счетчик пользователя на delta.
+
+    Если строки счетчиков еще нет, она создается пересчетом. Уменьшение
+    не уходит ниже нуля и не создает строк: при каскадном удалении
+    пользователя его счетчики уже могут быть удалены.
+    """
+    if user_id is None:
+        return
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats.filter(**{counter + '__gte': -delta}).update(
+            **{counter: F(counter) + delta})
+    elif not stats.update(**{counter: F(counter) + delta}):
+        recount_users([user_id])
+
+
+def change_post(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def recount_users(user_ids):
+    """Пересчитывает счетчики пользователей; возвращает число исправленных.
+    """
+    rows = (User.objects.filter(pk__in=user_ids)
+            .annotate(**{name: _count(model, field)
+                         for name, (model, field) in USER_COUNTERS.items()})
+            .values('pk', *USER_COUNTERS))
+    fresh = {row.pop('pk'): row for row in rows}
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id) for user_id in fresh],
+        ignore_conflicts=True)
+    stale = []
+    for stats in AuthorStats.objects.filter(user_id__in=fresh):
+        counters = fresh[stats.user_id]
+        if any(getattr(stats, name) != value
+               for name, value in counters.items()):
+            for name, value in counters.items():
+                setattr(stats, name, value)
+            stale.append(stats)
+    AuthorStats.objects.bulk_update(stale, list(USER_COUNTERS))
+    return len(stale)
+
+
+def recount_posts(post_ids):
+    stale = []
+    posts = (Post.objects.filter(pk__in=post_ids)
+             .annotate(actual=_count(Comment, 'post'))
+             .only('pk', 'comments_count'))
+    for post in posts:
+        if post.comments_count != post.actual:
+            post.comments_count = post.actual
+            stale.append(post)
+    Post.objects.bulk_update(stale, ['comments_count'])
+    return len(stale)
+
+
+def id_batches(queryset, batch_size=BATCH_SIZE):
+    """Списки первичных ключей по возрастанию, порциями batch_size."""
+    last = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last).order_by('pk')
+                     .values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
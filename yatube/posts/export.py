@@ -0,0 +1,108 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+# Строки склеиваются в куски примерно такого размера перед отправкой.
+BUFFER_SIZE = 64 * 1024
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# Набор данных -> (модель, поля values(), поле владельца для выгрузки
+# своих данных). Первое поле — ключ, по которому продолжается выгрузка.
+DATASETS = {
+    'posts': (Post, ('id', 'author__username', 'group__slug', 'text',
+                     'image', 'pub_date', 'updated'), 'author'),
+    'comments': (Comment, ('id', 'post_id', 'author__username', 'text',
+                           'created'), 'author'),
+    'follows': (Follow, ('id', 'user__username', 'author__username'),
+                'user'),
+}
+
+
+def rows(dataset, user=None, after=None, chunk_size=CHUNK_SIZE):
+    """Строки набора по возрастанию id, начиная после after.
+
+    iterator() читает базу кусками по chunk_size, поэтому память не
+    зависит от размера выгрузки.
+    """
+    model, fields, owner = DATASETS[dataset]
+    queryset = model.objects.all()
+    if user is not None:
+        queryset = queryset.filter(**{owner: user})
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    return (queryset.order_by('id').values_list(*fields)
+            .iterator(chunk_size=chunk_size))
+
+
+class _Line:
+    """Файлоподобный объект для csv.writer: write() возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(fields, records, header=True):
+    writer = csv.writer(_Line())
+    if header:
+        yield writer.writerow(fields)
+    for record in records:
+        yield writer.writerow(record)
+
+
+def ndjson_lines(fields, records):
+    for record in records:
+        yield json.dumps(dict(zip(fields, record)), cls=DjangoJSONEncoder,
+                         ensure_ascii=False) + '\n'
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Склеивает строки в куски байтов не меньше size."""
+    buffer = []
+    length = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzipped(chunks):
+    """Сжимает поток на лету в формат gzip (wbits=31)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(dataset, fmt='ndjson', user=None, after=None, gzip=False,
+           chunk_size=CHUNK_SIZE):
+    """Куски байтов выгрузки. При продолжении (after) заголовок CSV
+    не повторяется, чтобы докачанное можно было дописать к файлу.
+    """
+    fields = DATASETS[dataset][1]
+    records = rows(dataset, user, after, chunk_size)
+    if fmt == 'csv':
+        lines = csv_lines(fields, records, header=after is None)
+    else:
+        lines = ndjson_lines(fields, records)
+    chunks = buffered(lines)
+    return gzipped(chunks) if gzip else chunks
+
+
+def filename(dataset, fmt, gzip=False):
+    return '%s.%s%s' % (dataset, FORMATS[fmt][1], '.gz' if gzip else '')
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import Textarea, Select
+from . import images
 from .models import Post, Comment
 
 
@@ -11,6 +13,18 @@ class PostForm(forms.ModelForm):
             'text': Textarea(attrs={'class': 'form-control'}),
             'group': Select(attrs={'class': 'form-control'})}
 
+    def clean_image(self):
+        """Новая картинка проходит posts.images.process(); ее варианты
+        записываются сигналом после сохранения поста.
+        """
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image, self.instance._renditions = images.process(image)
+            self.instance.renditions = images.RENDITIONS_VERSION
+        elif not image:
+            self.instance.renditions = 0
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
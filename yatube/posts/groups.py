@@ -0,0 +1,32 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Substr
+
+from .models import Group, Post
+
+PER_PAGE = 50
+# Столько символов последнего поста показывается вместо заголовка.
+TITLE_LENGTH = 100
+
+
+def with_stats(groups):
+    """Группы с числом постов, временем и началом последнего поста.
+
+    Все считается одним запросом: коррелированные подзапросы идут по
+    индексу (group, -pub_date, -id) и только для групп из groups.
+    """
+    posts = Post.objects.filter(group=OuterRef('pk'))
+    counted = (posts.order_by().values('group')
+               .annotate(total=Count('pk')).values('total'))
+    latest = posts.order_by('-pub_date', '-id')
+    return groups.annotate(
+        posts_count=Coalesce(
+            Subquery(counted, output_field=IntegerField()), 0),
+        last_activity=Subquery(latest.values('pub_date')[:1]),
+        latest_title=Subquery(latest.annotate(
+            head=Substr('text', 1, TITLE_LENGTH)).values('head')[:1]),
+    )
+
+
+def directory():
+    """Группы для keyset-пагинации по slug (уникальный индекс)."""
+    return Group.objects.only('id', 'slug', 'title')
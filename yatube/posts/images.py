@@ -0,0 +1,182 @@
+import io
+import math
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Увеличивается при изменении набора вариантов или их путей: посты со
+# старой версией пересобираются командой warm_thumbnails.
+# 2 — папка вариантов названа именем оригинала с точкой.
+RENDITIONS_VERSION = 2
+RENDITIONS_DIR = 'posts/renditions'
+# Ширина и высота (None — без кадрирования) вариантов для ленты
+# и страницы поста.
+SIZES = {
+    'feed': ((480, 170), (960, 339)),
+    'detail': ((800, None), (1600, None)),
+}
+DISPLAY_WIDTH = {'feed': 960, 'detail': 1600}
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+ORIGINAL_MAX_WIDTH = 2560
+ORIGINAL_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'WEBP': {'quality': 90},
+    'PNG': {'optimize': True},
+}
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+ORIENTATION = 0x0112
+
+
+def open_image(file):
+    """Открывает картинку, читая только заголовок, и отсекает
+    декомпрессионные бомбы до декодирования пикселей.
+    """
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError:
+        raise ValidationError('Изображение слишком большое.')
+    except Exception:
+        raise ValidationError('Загрузите корректное изображение.')
+    if image.format not in ALLOWED_FORMATS:
+        raise ValidationError('Формат %s не поддерживается.' % image.format)
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение слишком большое (%d × %d).' % (width, height))
+    return image
+
+
+def decode(image, width):
+    """Декодирует картинку с учетом EXIF-ориентации так, чтобы итоговая
+    ширина была не меньше width; JPEG сразу декодируется в уменьшенном
+    масштабе (draft), метаданные не сохраняются.
+    """
+    source_width, source_height = image.size
+    rotated = image.getexif().get(ORIENTATION) in (5, 6, 7, 8)
+    final_width = source_height if rotated else source_width
+    scale = min(1, width / final_width)
+    image.draft('RGB', (math.ceil(source_width * scale),
+                        math.ceil(source_height * scale)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info
+            or image.mode in ('LA', 'PA') else 'RGB')
+    image.info.clear()
+    return image
+
+
+def resize(image, width, height=None):
+    if height is not None:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    if image.width <= width:
+        return image
+    return image.resize(
+        (width, round(image.height * width / image.width)), Image.LANCZOS)
+
+
+def encode(image, fmt, options):
+    if fmt == 'JPEG' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def rendition_name(name, kind, width, extension):
+    """Варианты лежат в папке с именем файла оригинала, поэтому по пути
+    варианта всегда можно найти оригинал (см. original_name).
+    """
+    return '%s/%s/%s-%d.%s' % (RENDITIONS_DIR, os.path.basename(name), kind,
+                               width, extension)
+
+
+def original_name(rendition):
+    """Путь оригинала по пути варианта или None для чужих путей."""
+    prefix = RENDITIONS_DIR + '/'
+    if not rendition.startswith(prefix):
+        return None
+    folder = rendition[len(prefix):].split('/', 1)[0]
+    return '%s/%s' % (os.path.dirname(RENDITIONS_DIR), folder)
+
+
+def render(image):
+    """Все варианты картинки: {(вид, ширина, расширение): bytes}."""
+    renditions = {}
+    for kind, sizes in SIZES.items():
+        for width, height in sizes:
+            resized = resize(image, width, height)
+            for extension, (fmt, options) in FORMATS.items():
+                renditions[kind, width, extension] = encode(
+                    resized, fmt, options)
+    return renditions
+
+
+def process(uploaded):
+    """Обрабатывает загруженную картинку.
+
+    Возвращает очищенный от метаданных и повернутый оригинал (не шире
+    ORIGINAL_MAX_WIDTH, того же формата и с тем же именем) и варианты
+    для save_renditions().
+    """
+    image = open_image(uploaded)
+    fmt = image.format
+    if getattr(image, 'is_animated', False):
+        uploaded.seek(0)
+        original = ContentFile(uploaded.read(), name=uploaded.name)
+        return original, render(decode(image, DISPLAY_WIDTH['detail']))
+    image = resize(decode(image, ORIGINAL_MAX_WIDTH), ORIGINAL_MAX_WIDTH)
+    if fmt == 'GIF':
+        data = encode(image.convert('P', palette=Image.ADAPTIVE), fmt, {})
+    else:
+        data = encode(image, fmt, ORIGINAL_OPTIONS[fmt])
+    return ContentFile(data, name=uploaded.name), render(image)
+
+
+def save_renditions(name, renditions):
+    for (kind, width, extension), data in renditions.items():
+        path = rendition_name(name, kind, width, extension)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        default_storage.save(path, ContentFile(data))
+
+
+def build_renditions(name):
+    """Варианты для уже сохраненной картинки name (путь в хранилище)."""
+    with default_storage.open(name) as file:
+        image = open_image(file)
+        renditions = render(decode(image, DISPLAY_WIDTH['detail']))
+    save_renditions(name, renditions)
+
+
+def srcset(name, kind, extension):
+    return ', '.join(
+        '%s %dw' % (default_storage.url(
+            rendition_name(name, kind, width, extension)), width)
+        for width, _ in SIZES[kind])
+
+
+def sources(post, kind):
+    """Контекст тега post_image; None, если вариантов еще нет."""
+    if post.renditions != RENDITIONS_VERSION:
+        return None
+    name = post.image.name
+    largest = SIZES[kind][-1][0]
+    return {
+        'src': default_storage.url(
+            rendition_name(name, kind, largest, 'jpg')),
+        'srcset': srcset(name, kind, 'jpg'),
+        'webp_srcset': srcset(name, kind, 'webp'),
+        'sizes': '(max-width: {0}px) 100vw, {0}px'.format(
+            DISPLAY_WIDTH[kind]),
+    }
@@ -0,0 +1,267 @@
+import json
+import random
+import shutil
+import string
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlencode, urlsafe_base64_encode
+from PIL import Image
+
+from core.testing import temporary_caches
+from posts import counters, timeline
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post
+from users import urls as users_urls
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-password'
+
+
+class QueryTimer:
+    """execute_wrapper: считает SQL-запросы и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Наполняет временную базу синтетическими данными и замеряет '
+            'все именованные маршруты posts и users.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=3000)
+        parser.add_argument('--image-share', type=float, default=0.2,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--fan-in', type=float, default=1.2,
+                            help='Показатель степенного закона подписок.')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на маршрут.')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Файл для JSON-отчета.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        media_root = tempfile.mkdtemp()
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      autoclobber=True)
+        try:
+            with override_settings(MEDIA_ROOT=media_root), \
+                    temporary_caches():
+                seeded = self.seed(options)
+                results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+        report = {
+            'created': timezone.now().isoformat(),
+            'dataset': seeded,
+            'requests_per_route': options['requests'],
+            'routes': results,
+        }
+        self.print_table(results)
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(data)
+        else:
+            self.stdout.write(data)
+
+    def seed(self, options):
+        rnd = self.random
+        users = [User(username='user%d' % number,
+                      first_name='Имя%d' % number,
+                      last_name='Фамилия%d' % number)
+                 for number in range(options['users'])]
+        users[0].set_password(PASSWORD)
+        # Сотрудник: export_all замеряется как выгрузка, а не редирект.
+        users[0].is_staff = True
+        User.objects.bulk_create(users, batch_size=1000)
+        user_ids = list(User.objects.order_by('id')
+                        .values_list('id', flat=True))
+        Group.objects.bulk_create(
+            [Group(slug='group%d' % number, title='Группа %d' % number,
+                   description='Описание')
+             for number in range(options['groups'])], batch_size=1000)
+        group_ids = list(Group.objects.values_list('id', flat=True))
+        images = [self.make_image(number) for number in range(5)]
+        posts = []
+        for number in range(options['posts']):
+            posts.append(Post(
+                author_id=rnd.choice(user_ids),
+                group_id=rnd.choice(group_ids + [None]),
+                text=self.text(rnd.randint(20, 400)),
+                image=(rnd.choice(images)
+                       if rnd.random() < options['image_share'] else '')))
+            if len(posts) >= 1000:
+                Post.objects.bulk_create(posts)
+                posts = []
+        Post.objects.bulk_create(posts)
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        comments = []
+        for number in range(options['comments']):
+            comments.append(Comment(post_id=rnd.choice(post_ids),
+                                    author_id=rnd.choice(user_ids),
+                                    text=self.text(rnd.randint(5, 200))))
+            if len(comments) >= 1000:
+                Comment.objects.bulk_create(comments)
+                comments = []
+        Comment.objects.bulk_create(comments)
+        # Популярность авторов подчиняется степенному закону: вес автора
+        # обратно пропорционален его рангу в степени fan_in.
+        weights = [1 / (rank + 1) ** options['fan_in']
+                   for rank in range(len(user_ids))]
+        pairs = set()
+        for _ in range(options['follows']):
+            user_id = rnd.choice(user_ids)
+            author_id = rnd.choices(user_ids, weights)[0]
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in pairs], batch_size=1000)
+        for batch in counters.id_batches(User.objects.all()):
+            counters.recount_users(batch)
+        for batch in counters.id_batches(Post.objects.all()):
+            counters.recount_posts(batch)
+        for user_id in {user_id for user_id, _ in pairs}:
+            timeline.backfill(user_id)
+        # bulk_create обходит сигналы, которые ведут индекс поиска.
+        call_command('rebuild_search_index', stdout=StringIO())
+        return {
+            'users': len(user_ids),
+            'groups': len(group_ids),
+            'posts': len(post_ids),
+            'comments': options['comments'],
+            'follows': len(pairs),
+        }
+
+    def text(self, length):
+        letters = string.ascii_lowercase + ' ' * 5
+        return ''.join(self.random.choice(letters) for _ in range(length))
+
+    def make_image(self, number):
+        buffer = BytesIO()
+        color = tuple(self.random.randrange(256) for _ in range(3))
+        Image.new('RGB', (1600, 1200), color).save(buffer, 'JPEG')
+        return default_storage.save('posts/bench%d.jpg' % number,
+                                    ContentFile(buffer.getvalue()))
+
+    def routes(self):
+        """(имя маршрута, URL, метод, данные) для каждого маршрута."""
+        user = User.objects.order_by('id').first()
+        author = (User.objects.exclude(pk=user.pk)
+                  .order_by('-stats__followers_count').first())
+        post = Post.objects.filter(author=user).first() or Post.objects.last()
+        group = Group.objects.first()
+        args = {
+            'slug': group.slug,
+            'username': author.username,
+            'post_id': post.id,
+            'dataset': 'posts',
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        }
+        routes = []
+        for namespace, module in (('posts', posts_urls),
+                                  ('users', users_urls)):
+            for pattern in module.urlpatterns:
+                name = '%s:%s' % (namespace, pattern.name)
+                kwargs = {key: args[key]
+                          for key in pattern.pattern.converters}
+                if pattern.name == 'post_edit':
+                    kwargs['post_id'] = post.id
+                url = reverse(name, kwargs=kwargs)
+                if pattern.name == 'search':
+                    # Самое длинное слово поста заведомо что-то находит.
+                    url += '?' + urlencode(
+                        {'q': max(post.text.split(), key=len)})
+                if pattern.name == 'add_comment':
+                    routes.append((name, url, 'post', {'text': 'bench'}))
+                else:
+                    routes.append((name, url, 'get', None))
+        # Выход из системы завершает сессию: замеряем его последним.
+        routes.sort(key=lambda route: route[0] == 'users:logout')
+        return routes, user
+
+    def run(self, options):
+        routes, user = self.routes()
+        client = Client()
+        client.login(username=user.username, password=PASSWORD)
+        results = []
+        for name, url, method, data in routes:
+            for _ in range(options['warmup']):
+                getattr(client, method)(url, data)
+            latencies = []
+            timer = QueryTimer()
+            statuses = set()
+            started = time.perf_counter()
+            with connection.execute_wrapper(timer):
+                for _ in range(options['requests']):
+                    request_started = time.perf_counter()
+                    response = getattr(client, method)(url, data)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    latencies.append(time.perf_counter() - request_started)
+                    statuses.add(response.status_code)
+            elapsed = time.perf_counter() - started
+            requests = len(latencies)
+            results.append({
+                'route': name,
+                'url': url,
+                'method': method.upper(),
+                'status': sorted(statuses),
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p95_ms': percentile(latencies, 0.95) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'rps': requests / elapsed,
+                'queries_per_request': timer.count / requests,
+                'sql_ms_per_request': timer.seconds * 1000 / requests,
+            })
+        return results
+
+    def print_table(self, results):
+        header = '%-32s %8s %8s %8s %8s %7s %8s' % (
+            'route', 'p50 ms', 'p95 ms', 'p99 ms', 'rps', 'queries',
+            'sql ms')
+        self.stderr.write(header)
+        for row in results:
+            self.stderr.write('%-32s %8.2f %8.2f %8.2f %8.1f %7.1f %8.2f' % (
+                row['route'], row['p50_ms'], row['p95_ms'], row['p99_ms'],
+                row['rps'], row['queries_per_request'],
+                row['sql_ms_per_request']))
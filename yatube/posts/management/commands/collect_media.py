@@ -0,0 +1,212 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore
+
+from posts import images
+from posts.models import Post
+
+UPLOAD_DIR = 'posts/'
+
+
+class RateLimiter:
+    """Не больше rate удалений в секунду в среднем (0 — без ограничения)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.count = 0
+
+    def __call__(self, count=1):
+        self.count += count
+        if not self.rate:
+            return
+        ahead = self.count / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def walk(root, directory=''):
+    """Файлы дерева (путь от root, DirEntry) без построения списка:
+    в памяти только открытые итераторы os.scandir по глубине дерева.
+    """
+    with os.scandir(os.path.join(root, directory)) as entries:
+        for entry in entries:
+            path = os.path.join(directory, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(root, path)
+            elif entry.is_file(follow_symlinks=False):
+                yield path.replace(os.sep, '/'), entry
+
+
+def referenced_images(names):
+    return set(Post.objects.filter(image__in=set(names))
+               .values_list('image', flat=True))
+
+
+def existing_keys(keys):
+    return set(KVStore.objects.filter(key__in=keys)
+               .values_list('key', flat=True))
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов, их варианты и миниатюры sorl, на '
+            'которые не ссылается ни один Post.image, и записи kvstore '
+            'миниатюр удаленных картинок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только отчет, ничего не удалять.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--rate', type=float, default=200,
+                            help='Удалений в секунду, 0 — без ограничения.')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд: '
+                                 'пост с ними может быть еще не сохранен.')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.limit = RateLimiter(options['rate'])
+        self.newer_than = time.time() - options['min_age']
+        self.report = {}
+        self.collect_kvstore()
+        self.collect_files()
+        verb = 'к удалению' if self.dry_run else 'удалено'
+        for category, stats in self.report.items():
+            self.stdout.write(
+                '%-11s просмотрено %9d  %s %9d  (%.1f МБ)'
+                % (category, stats['scanned'], verb, stats['orphaned'],
+                   stats['bytes'] / 2 ** 20))
+
+    def count(self, category, scanned=0, orphaned=0, size=0):
+        stats = self.report.setdefault(
+            category, {'scanned': 0, 'orphaned': 0, 'bytes': 0})
+        stats['scanned'] += scanned
+        stats['orphaned'] += orphaned
+        stats['bytes'] += size
+
+    def kvstore_rows(self, identity):
+        """Записи kvstore с префиксом identity пачками по ключу."""
+        prefix = add_prefix('', identity)
+        last = prefix
+        while True:
+            rows = list(KVStore.objects.filter(
+                key__startswith=prefix, key__gt=last)
+                .order_by('key').values_list('key', 'value')
+                [:self.batch_size])
+            if not rows:
+                return
+            yield rows
+            last = rows[-1][0]
+
+    def collect_kvstore(self):
+        """Миниатюры картинок, которых больше нет в постах.
+
+        Исходные картинки в kvstore — это записи image вне
+        THUMBNAIL_PREFIX; списки миниатюр без записи источника тоже
+        считаются осиротевшими.
+        """
+        thumbnail_prefix = sorl_settings.THUMBNAIL_PREFIX
+        for rows in self.kvstore_rows('image'):
+            sources = {}
+            for key, value in rows:
+                name = deserialize(value)['name']
+                if not name.startswith(thumbnail_prefix):
+                    sources[name] = key
+            live = referenced_images(sources)
+            self.count('kvstore', scanned=len(sources))
+            for name, key in sources.items():
+                if name not in live:
+                    self.drop_source(del_prefix(key))
+        for rows in self.kvstore_rows('thumbnails'):
+            keys = {del_prefix(key): key for key, _ in rows}
+            sources = existing_keys([add_prefix(key) for key in keys])
+            for key in keys:
+                if add_prefix(key) not in sources:
+                    self.drop_source(key)
+
+    def drop_source(self, key):
+        kvstore = default.kvstore
+        thumbnails = kvstore._get(key, identity='thumbnails') or []
+        self.count('kvstore', orphaned=1)
+        self.count('thumbnails', orphaned=len(thumbnails))
+        if self.dry_run:
+            return
+        for thumbnail_key in thumbnails:
+            thumbnail = kvstore._get(thumbnail_key)
+            if thumbnail:
+                kvstore.delete(thumbnail, delete_thumbnails=False)
+                thumbnail.delete()
+        kvstore._delete(key, identity='thumbnails')
+        kvstore._delete(key)
+        self.limit(len(thumbnails) or 1)
+
+    def collect_files(self):
+        root = settings.MEDIA_ROOT
+        batch = []
+        for directory in (UPLOAD_DIR, sorl_settings.THUMBNAIL_PREFIX):
+            if not os.path.isdir(os.path.join(root, directory)):
+                continue
+            for path, entry in walk(root, directory.rstrip('/')):
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > self.newer_than:
+                    continue
+                batch.append((path, stat.st_size))
+                if len(batch) >= self.batch_size:
+                    self.collect_batch(batch)
+                    batch = []
+        self.collect_batch(batch)
+
+    def category(self, path):
+        if path.startswith(sorl_settings.THUMBNAIL_PREFIX):
+            return 'thumbnails'
+        if images.original_name(path):
+            return 'renditions'
+        return 'originals'
+
+    def collect_batch(self, batch):
+        """Удаляет файлы пачки, на которые нет ссылок."""
+        owners = {}
+        keys = {}
+        for path, _ in batch:
+            category = self.category(path)
+            if category == 'thumbnails':
+                keys[path] = add_prefix(
+                    ImageFile(path, default.storage).key)
+            else:
+                owners[path] = images.original_name(path) or path
+        live_images = referenced_images(owners.values())
+        live_keys = existing_keys(keys.values())
+        orphans = []
+        for path, size in batch:
+            category = self.category(path)
+            if category == 'thumbnails':
+                alive = keys[path] in live_keys
+            else:
+                alive = owners[path] in live_images
+            self.count(category, scanned=1)
+            if not alive:
+                self.count(category, orphaned=1, size=size)
+                orphans.append(path)
+        if self.dry_run or not orphans:
+            return
+        folders = set()
+        for path in orphans:
+            default_storage.delete(path)
+            if self.category(path) == 'renditions':
+                folders.add(os.path.dirname(path))
+        for folder in folders:
+            try:
+                os.rmdir(default_storage.path(folder))
+            except OSError:
+                pass
+        self.limit(len(orphans))
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты, комментарии или подписки в CSV '
+            'или NDJSON (все или одного пользователя).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(export.DATASETS))
+        parser.add_argument('--format', choices=list(export.FORMATS),
+                            default='ndjson')
+        parser.add_argument('--user', help='Только данные этого '
+                                           'пользователя (username).')
+        parser.add_argument('--after', type=int,
+                            help='Продолжить после записи с этим id.')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int,
+                            default=export.CHUNK_SIZE)
+        parser.add_argument('--output', help='Файл; по умолчанию stdout. '
+                                             'С --after дописывается.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError('Нет пользователя %s' % options['user'])
+        chunks = export.stream(options['dataset'], options['format'],
+                               user=user, after=options['after'],
+                               gzip=options['gzip'],
+                               chunk_size=options['chunk_size'])
+        if not options['output']:
+            # Байты пишутся в поток под self.stdout: у текстового stdout —
+            # в его buffer, двоичный (call_command(stdout=BytesIO())) — как
+            # есть.
+            out = self.stdout._out
+            out = getattr(out, 'buffer', out)
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+        mode = 'ab' if options['after'] is not None else 'wb'
+        with open(options['output'], mode) as output:
+            for chunk in chunks:
+                output.write(chunk)
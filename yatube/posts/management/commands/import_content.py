@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.models import Comment, Group, ImportCheckpoint, Post
+from posts.search import comments_index, posts_index
+
+User = get_user_model()
+
+KINDS = ('user', 'group', 'post', 'comment')
+
+
+class LookupCache:
+    """Ограниченный LRU-кэш «естественный ключ -> id»."""
+
+    def __init__(self, queryset, field, size=100000):
+        self.queryset = queryset
+        self.field = field
+        self.size = size
+        self.data = OrderedDict()
+
+    def get_many(self, keys):
+        missing = {key for key in keys if key and key not in self.data}
+        if missing:
+            rows = (self.queryset.filter(**{self.field + '__in': missing})
+                    .values_list(self.field, 'pk'))
+            for key, pk in rows:
+                self.put(key, pk)
+        result = {}
+        for key in keys:
+            if key in self.data:
+                self.data.move_to_end(key)
+                result[key] = self.data[key]
+        return result
+
+    def put(self, key, pk):
+        self.data[key] = pk
+        self.data.move_to_end(key)
+        if len(self.data) > self.size:
+            self.data.popitem(last=False)
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise CommandError('Неверная дата: %r' % value)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+class Command(BaseCommand):
+    help = ('Потоково импортирует пользователей, группы, посты и '
+            'комментарии из JSONL или CSV (по одной записи на строку, '
+            'тип записи в поле type).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint',
+                            help='Имя позиции импорта в базе; по '
+                                 'умолчанию полный путь к файлу')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить с сохраненной позиции.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        self.batch_size = options['batch_size']
+        self.checkpoint = options['checkpoint'] or os.path.abspath(path)
+        skip = self.read_checkpoint() if options['resume'] else 0
+        self.users = LookupCache(User.objects.all(), 'username')
+        self.groups = LookupCache(Group.objects.all(), 'slug')
+        self.started = time.monotonic()
+        self.written = 0
+        with open(path, newline='', encoding='utf-8') as source:
+            records = self.parse(source, fmt)
+            batch = []
+            line = 0
+            for line, record in enumerate(records, 1):
+                if line <= skip:
+                    continue
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch, line)
+                    batch = []
+            self.flush(batch, line)
+        self.report(final=True)
+        self.stdout.write('Счетчики и ленты не обновлялись: выполните '
+                          'recount и timelines --backfill.')
+
+    def parse(self, source, fmt):
+        if fmt == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise CommandError('Строка %d: %s' % (number, error))
+
+    def read_checkpoint(self):
+        checkpoint = ImportCheckpoint.objects.filter(
+            name=self.checkpoint).first()
+        return checkpoint.line if checkpoint else 0
+
+    def write_checkpoint(self, line):
+        ImportCheckpoint.objects.update_or_create(
+            name=self.checkpoint, defaults={'line': line})
+
+    def flush(self, batch, line):
+        if not batch:
+            return
+        by_kind = {kind: [] for kind in KINDS}
+        for record in batch:
+            kind = record.get('type')
+            if kind not in by_kind:
+                raise CommandError('Неизвестный тип записи: %r' % kind)
+            by_kind[kind].append(record)
+        # Одна транзакция на порцию вместе с позицией: либо записано и то
+        # и другое, либо при повторном запуске порция импортируется заново.
+        with transaction.atomic():
+            self.import_users(by_kind['user'])
+            self.import_groups(by_kind['group'])
+            self.import_posts(by_kind['post'])
+            self.import_comments(by_kind['comment'])
+            self.write_checkpoint(line)
+        self.written += len(batch)
+        self.report()
+
+    def report(self, final=False):
+        elapsed = time.monotonic() - self.started or 1e-9
+        self.stdout.write('%s %d строк, %.0f строк/с' % (
+            'Итого:' if final else 'Записано', self.written,
+            self.written / elapsed))
+
+    def import_users(self, records):
+        if not records:
+            return
+        User.objects.bulk_create(
+            [User(username=record['username'],
+                  email=record.get('email') or '',
+                  first_name=record.get('first_name') or '',
+                  last_name=record.get('last_name') or '',
+                  password='!')
+             for record in records],
+            batch_size=self.batch_size, ignore_conflicts=True)
+
+    def import_groups(self, records):
+        if not records:
+            return
+        Group.objects.bulk_create(
+            [Group(slug=record['slug'],
+                   title=record.get('title') or record['slug'],
+                   description=record.get('description') or '')
+             for record in records],
+            batch_size=self.batch_size, ignore_conflicts=True)
+
+    def import_posts(self, records):
+        if not records:
+            return
+        authors = self.users.get_many([r['author'] for r in records])
+        groups = self.groups.get_many([r.get('group') for r in records])
+        posts = []
+        for record in records:
+            if record['author'] not in authors:
+                raise CommandError('Нет автора %r' % record['author'])
+            posts.append(Post(
+                id=record.get('id') or None,
+                text=record['text'],
+                author_id=authors[record['author']],
+                group_id=groups.get(record.get('group')),
+                image=record.get('image') or '',
+                pub_date=parse_date(record.get('pub_date'))))
+        after = posts_index.last_id()
+        Post.objects.bulk_create(posts, batch_size=self.batch_size,
+                                 ignore_conflicts=True)
+        # bulk_create обходит сигналы, которые ведут индекс поиска.
+        posts_index.index_new(after, [post.id for post in posts if post.id])
+
+    def import_comments(self, records):
+        if not records:
+            return
+        authors = self.users.get_many([r['author'] for r in records])
+        comments = []
+        for record in records:
+            if record['author'] not in authors:
+                raise CommandError('Нет автора %r' % record['author'])
+            comments.append(Comment(
+                post_id=int(record['post']),
+                author_id=authors[record['author']],
+                text=record['text'],
+                created=parse_date(record.get('created'))))
+        after = comments_index.last_id()
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        comments_index.index_new(after)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import comments_index, posts_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовые индексы постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not posts_index.available:
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        for name, index in (('постов', posts_index),
+                            ('комментариев', comments_index)):
+            total = index.rebuild(options['batch_size'])
+            self.stdout.write('Проиндексировано %s: %d' % (name, total))
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики порциями.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=counters.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed = 0
+        for batch in counters.id_batches(User.objects.all(), batch_size):
+            fixed += counters.recount_users(batch)
+        self.stdout.write('Исправлено счетчиков пользователей: %d' % fixed)
+        fixed = 0
+        for batch in counters.id_batches(Post.objects.all(), batch_size):
+            fixed += counters.recount_posts(batch)
+        self.stdout.write('Исправлено счетчиков постов: %d' % fixed)
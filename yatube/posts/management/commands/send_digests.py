@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import digests
+
+
+class Command(BaseCommand):
+    help = ('Рассылает подписчикам дайджест новых постов их авторов. '
+            'Большую базу можно разделить на шарды (--shards) и '
+            'запустить по процессу на шард.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard', type=int, default=0)
+        parser.add_argument('--shards', type=int, default=1)
+        parser.add_argument('--batch-size', type=int,
+                            default=digests.BATCH_SIZE)
+        parser.add_argument('--max-posts', type=int,
+                            default=digests.MAX_POSTS,
+                            help='Постов в одном письме.')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['shard'] < options['shards']:
+            raise CommandError('Нужно 0 <= --shard < --shards')
+        started = time.monotonic()
+        stats = digests.send_digests(options['shard'], options['shards'],
+                                     options['batch_size'],
+                                     options['max_posts'])
+        self.stdout.write('Шард %d/%d: подписчиков %d, писем %d, за %.1f с'
+                          % (options['shard'], options['shards'],
+                             stats['users'], stats['sent'],
+                             time.monotonic() - started))
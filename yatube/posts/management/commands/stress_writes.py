@@ -0,0 +1,151 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from core.testing import temporary_caches
+from posts.models import Post
+
+User = get_user_model()
+
+# Режим plain — SQLite как до настройки: журнал отката и ни очереди
+# писателей, ни повторов.
+MODES = {
+    'plain': {'SQLITE_PRAGMAS': {}, 'SQLITE_SERIALIZE_WRITES': False},
+    'tuned': {},
+}
+
+
+def writer(number, post_id, deadline, results):
+    client = Client()
+    client.force_login(User.objects.get(username='writer%d' % number))
+    url = reverse('posts:add_comment', args=[post_id])
+    writes = errors = 0
+    while time.monotonic() < deadline:
+        try:
+            client.post(url, {'text': 'Комментарий %d' % writes})
+            writes += 1
+        except OperationalError:
+            errors += 1
+    results.put({'writes': writes, 'errors': errors})
+
+
+def reader(number, post_id, deadline, results):
+    client = Client()
+    urls = [reverse('posts:index'),
+            reverse('posts:post_detail', args=[post_id])]
+    latencies = []
+    errors = 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            client.get(urls[len(latencies) % 2])
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    results.put({'reads': len(latencies), 'read_errors': errors,
+                 'read_max_ms': max(latencies, default=0) * 1000})
+
+
+def worker(target, mode, *args):
+    connections.close_all()
+    with override_settings(**MODES[mode]):
+        target(*args)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест записи в SQLite: параллельные процессы '
+            'комментируют пост, пока другие читают ленту, сначала без '
+            'настройки базы (plain), затем с WAL и очередью писателей '
+            '(tuned).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--mode', choices=list(MODES), action='append',
+                            help='По умолчанию все режимы.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Тест рассчитан на SQLite.')
+        setup_test_environment()
+        report = {}
+        with temporary_caches():
+            for mode in options['mode'] or list(MODES):
+                report[mode] = self.run(mode, options)
+                self.stdout.write(
+                    '%(mode)-6s записей/с %(writes_per_second)8.1f  ошибок '
+                    '%(errors)5d  чтений/с %(reads_per_second)8.1f  '
+                    'макс. чтение %(read_max_ms)7.1f мс'
+                    % dict(report[mode], mode=mode))
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    def run(self, mode, options):
+        directory = tempfile.mkdtemp()
+        settings_dict = connection.settings_dict
+        old_name = settings_dict['NAME']
+        connections.close_all()
+        settings_dict['NAME'] = os.path.join(directory, 'stress.sqlite3')
+        try:
+            with override_settings(**MODES[mode]):
+                call_command('migrate', verbosity=0)
+                post_id = self.seed(options['writers'])
+                connections.close_all()
+            cache.clear()
+            results = self.spawn(mode, post_id, options)
+        finally:
+            connections.close_all()
+            settings_dict['NAME'] = old_name
+            shutil.rmtree(directory, ignore_errors=True)
+        seconds = options['seconds']
+        writes = sum(result.get('writes', 0) for result in results)
+        reads = sum(result.get('reads', 0) for result in results)
+        return {
+            'writes': writes,
+            'writes_per_second': writes / seconds,
+            'errors': sum(result.get('errors', 0) for result in results),
+            'reads': reads,
+            'reads_per_second': reads / seconds,
+            'read_errors': sum(result.get('read_errors', 0)
+                               for result in results),
+            'read_max_ms': max(result.get('read_max_ms', 0)
+                               for result in results),
+        }
+
+    def seed(self, writers):
+        author = User.objects.create_user(username='author')
+        for number in range(writers):
+            User.objects.create_user(username='writer%d' % number)
+        return Post.objects.create(author=author, text='Пост').id
+
+    def spawn(self, mode, post_id, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        deadline = time.monotonic() + options['seconds']
+        processes = [
+            context.Process(target=worker, args=(
+                writer, mode, number, post_id, deadline, results))
+            for number in range(options['writers'])]
+        processes += [
+            context.Process(target=worker, args=(
+                reader, mode, number, post_id, deadline, results))
+            for number in range(options['readers'])]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return collected
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает подсказки «Кого почитать» по графу подписок. '
+            'Запускается периодически (cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=suggestions.TOP,
+                            help='Подсказок на пользователя.')
+        parser.add_argument('--batch-size', type=int,
+                            default=suggestions.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        graph = suggestions.Graph.load()
+        self.stdout.write('Граф: %d узлов, %.1f МБ, загружен за %.1f с'
+                          % (graph.size, graph.nbytes / 2 ** 20,
+                             time.monotonic() - started))
+        stats = suggestions.recompute(graph, options['top'],
+                                      options['batch_size'])
+        self.stdout.write('Пользователей: %d, подсказок: %d, всего %.1f с'
+                          % (stats['users'], stats['suggestions'],
+                             time.monotonic() - started))
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Заполняет и обрезает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help='Заполнить ленты из таблицы подписок.')
+        parser.add_argument('--trim', action='store_true',
+                            help='Обрезать ленты до TIMELINE_LENGTH.')
+        parser.add_argument('--user', dest='usernames', action='append',
+                            help='Обработать только этих пользователей.')
+
+    def handle(self, *args, **options):
+        users = Follow.objects.exclude(user=None)
+        if options['usernames']:
+            users = users.filter(user__username__in=options['usernames'])
+        user_ids = (users.order_by('user_id')
+                    .values_list('user_id', flat=True).distinct()
+                    .iterator(chunk_size=timeline.BATCH_SIZE))
+        processed = trimmed = 0
+        for user_id in user_ids:
+            if options['backfill']:
+                timeline.backfill(user_id)
+            if options['trim']:
+                trimmed += timeline.trim(user_id)
+            processed += 1
+        self.stdout.write(
+            'Лент обработано: %d, удалено записей: %d'
+            % (processed, trimmed))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Добавляет к рейтингу популярного комментарии, появившиеся '
+            'после прошлого запуска. Запускается периодически (cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=trending.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        stats = trending.update(options['batch_size'])
+        self.stdout.write('Учтено комментариев: %d, удалено из рейтинга: %d'
+                          % (stats['comments'], stats['removed']))
@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создает варианты картинок (posts.images) для постов, у '
+            'которых их нет или они устаревшей версии.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        names = (Post.objects.exclude(image='')
+                 .exclude(renditions=images.RENDITIONS_VERSION)
+                 .order_by('id')
+                 .values_list('image', flat=True)
+                 .iterator(chunk_size=options['batch_size']))
+        started = time.monotonic()
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            batch = []
+            for name in names:
+                batch.append(name)
+                if len(batch) >= options['batch_size']:
+                    ok, errors = self.run_batch(pool, batch)
+                    done, failed = done + ok, failed + errors
+                    batch = []
+            ok, errors = self.run_batch(pool, batch)
+            done, failed = done + ok, failed + errors
+        self.stdout.write('Готово: %d, ошибок: %d, за %.1f с'
+                          % (done, failed, time.monotonic() - started))
+
+    def run_batch(self, pool, names):
+        ready = []
+        errors = 0
+        for name, error in zip(names, pool.map(self.warm, names)):
+            if error:
+                errors += 1
+                self.stderr.write('%s: %s' % (name, error))
+            else:
+                ready.append(name)
+        Post.objects.filter(image__in=ready).update(
+            renditions=images.RENDITIONS_VERSION)
+        return len(ready), errors
+
+    def warm(self, name):
+        try:
+            images.build_renditions(name)
+        except Exception as error:
+            return error
+        return None
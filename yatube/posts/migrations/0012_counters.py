@@ -0,0 +1,67 @@
+# Generated by Django 2.2.19 on 2026-10-18 08:52
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _count(model, field):
+    """Коррелированный подзапрос COUNT(*) по внешнему ключу field."""
+    counted = (model.objects.filter(**{field: models.OuterRef('pk')})
+               .order_by().values(field)
+               .annotate(total=models.Count('pk')).values('total'))
+    return Coalesce(
+        models.Subquery(counted, output_field=models.IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    users = User.objects.annotate(
+        posts_total=_count(Post, 'author'),
+        comments_total=_count(Comment, 'author'),
+        followers_total=_count(Follow, 'author'),
+        following_total=_count(Follow, 'user'),
+    ).values_list('pk', 'posts_total', 'comments_total', 'followers_total',
+                  'following_total')
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=pk,
+                     posts_count=posts_total,
+                     comments_count=comments_total,
+                     followers_count=followers_total,
+                     following_count=following_total)
+         for pk, posts_total, comments_total, followers_total,
+         following_total in users.iterator()],
+        batch_size=1000)
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0011_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.19 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def deduplicate_follows(apps, schema_editor):
+    """Удаляет повторные подписки, оставляя самую раннюю запись пары."""
+    Follow = apps.get_model('posts', 'Follow')
+    while True:
+        pairs = list(
+            Follow.objects.exclude(user=None).exclude(author=None)
+            .values('user_id', 'author_id')
+            .annotate(total=models.Count('id'), keep=models.Min('id'))
+            .filter(total__gt=1).order_by()[:BATCH_SIZE])
+        if not pairs:
+            return
+        for pair in pairs:
+            Follow.objects.filter(
+                user_id=pair['user_id'], author_id=pair['author_id'],
+            ).exclude(id=pair['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
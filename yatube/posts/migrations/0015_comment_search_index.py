@@ -0,0 +1,43 @@
+# Generated by Django 2.2.19 on 2026-10-18 09:01
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_comment_fts '
+            'USING fts5(text)')
+        last_id = 0
+        while True:
+            cursor.execute(
+                'SELECT id, text FROM posts_comment WHERE id > %s '
+                'ORDER BY id LIMIT %s', [last_id, BATCH_SIZE])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                'INSERT INTO posts_comment_fts(rowid, text) VALUES (%s, %s)',
+                rows)
+            last_id = rows[-1][0]
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_comment_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='renditions',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
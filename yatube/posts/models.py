@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -7,7 +8,7 @@ User = get_user_model()
 class Time(models.Model):
 
     created = models.DateTimeField(
-        auto_now_add=True
+        default=timezone.now, editable=False
     )
 
     class Meta:
@@ -26,7 +27,8 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField(help_text='Текст нового поста',
                             verbose_name='Текст поста')
-    pub_date = models.DateTimeField(auto_now_add=True)
+    pub_date = models.DateTimeField(default=timezone.now, editable=False)
+    updated = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,9 +45,21 @@ class Post(models.Model):
         'Картинка',
         upload_to='posts/',
         blank=True)
+    # Версия набора вариантов картинки (posts.images), 0 — вариантов нет.
+    renditions = models.PositiveSmallIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta():
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['image'], name='post_image_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -64,6 +78,10 @@ class Comment(Time):
 
     class Meta():
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -80,3 +98,133 @@ class Follow(models.Model):
                                null=True,
                                verbose_name='Автор',
                                related_name='following')
+
+    class Meta():
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики пользователя.
+
+    Обновляются сигналами при сохранении и удалении Post, Comment и
+    Follow; расхождения исправляет команда recount.
+    """
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write) и при изменении
+    подписок; pub_date и author скопированы из поста, чтобы страница
+    ленты читалась одним диапазоном по индексу (user, pub_date).
+    """
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta():
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class Digest(models.Model):
+    """Граница уже разосланного дайджеста подписок пользователя."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='digest')
+    sent_until = models.DateTimeField()
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TrendingPost(models.Model):
+    """Рейтинг «популярное сейчас», который пересчитывает update_trending.
+
+    score — натуральный логарифм суммы exp(λ·(t − эпоха)) по времени t
+    комментариев поста. Общий множитель затухания exp(−λ·сейчас) порядка
+    не меняет, поэтому старые оценки не нужно пересчитывать, а новые
+    комментарии добавляются через logaddexp.
+    """
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='trending')
+    score = models.FloatField()
+
+    class Meta():
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.post)
+
+
+class TrendingState(models.Model):
+    """Водяной знак рейтинга: последний учтенный комментарий."""
+    last_comment_id = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(null=True)
+
+
+class ImportCheckpoint(models.Model):
+    """Позиция import_content: последняя записанная строка источника.
+
+    Сдвигается в транзакции порции, поэтому порция не записывается дважды.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    line = models.PositiveIntegerField(default=0)
+
+
+class Suggestion(models.Model):
+    """«Кого почитать»: лучшие кандидаты в подписки пользователя.
+
+    Целиком пересчитываются командой suggest_follows.
+    """
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='suggestions')
+    suggested = models.ForeignKey(User,
+                                  on_delete=models.CASCADE,
+                                  related_name='+')
+    score = models.PositiveIntegerField()
+
+    class Meta():
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'suggested'],
+                                    name='unique_suggestion'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score'],
+                         name='suggestion_user_score_idx'),
+        ]
@@ -0,0 +1,184 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Индекс — отдельная таблица FTS5 с rowid, равным id записи; ее держат
+в актуальном состоянии сигналы сохранения и удаления. Записи, созданные
+через bulk_create в обход сигналов, добавляет index_new (import_content
+делает это в транзакции каждой порции), а команда rebuild_search_index
+перестраивает индекс целиком порциями.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core.paginator import CursorPaginator, InvalidCursor, PER_PAGE
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 16
+
+
+class SearchIndex:
+    def __init__(self, table, source, column='text'):
+        self.table = table
+        self.source = source
+        self.column = column
+
+    @property
+    def available(self):
+        return connection.vendor == 'sqlite'
+
+    def update(self, pk, text):
+        if not self.available:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE rowid = %%s' % self.table,
+                           [pk])
+            cursor.execute(
+                'INSERT INTO %s(rowid, %s) VALUES (%%s, %%s)'
+                % (self.table, self.column), [pk, text])
+
+    def remove(self, pk):
+        if not self.available:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE rowid = %%s' % self.table,
+                           [pk])
+
+    def index_new(self, after, pks=()):
+        """Индексирует записи с id > after или из pks, которых в индексе
+        еще нет; возвращает их число.
+        """
+        if not self.available:
+            return 0
+        pks = list(pks)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO {table}(rowid, {column}) '
+                'SELECT id, {column} FROM {source} WHERE (id > %s{extra}) '
+                'AND id NOT IN (SELECT rowid FROM {table})'.format(
+                    table=self.table, column=self.column,
+                    source=self.source,
+                    extra=' OR id IN (%s)' % ', '.join(['%s'] * len(pks))
+                    if pks else ''),
+                [after, *pks])
+            return cursor.rowcount
+
+    def last_id(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT MAX(id) FROM %s' % self.source)
+            return cursor.fetchone()[0] or 0
+
+    def matching_ids(self, query):
+        """Подзапрос id записей для фильтра pk__in."""
+        return RawSQL('SELECT rowid FROM %s WHERE %s MATCH %%s'
+                      % (self.table, self.table), [match_query(query)])
+
+    def rebuild(self, batch_size=1000):
+        """Перестраивает индекс порциями; возвращает число записей."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % self.table)
+        last_id = total = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT id, %s FROM %s WHERE id > %%s '
+                    'ORDER BY id LIMIT %%s' % (self.column, self.source),
+                    [last_id, batch_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                cursor.executemany(
+                    'INSERT INTO %s(rowid, %s) VALUES (%%s, %%s)'
+                    % (self.table, self.column), rows)
+            last_id = rows[-1][0]
+            total += len(rows)
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO %s(%s) VALUES ('optimize')"
+                           % (self.table, self.table))
+        return total
+
+
+posts_index = SearchIndex('posts_post_fts', 'posts_post')
+comments_index = SearchIndex('posts_comment_fts', 'posts_comment')
+
+
+def match_query(query):
+    """Запрос пользователя как набор фраз FTS5 (без операторов)."""
+    terms = re.findall(r'\w+', query)
+    return ' '.join('"%s"' % term for term in terms)
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet)
+                     .replace(HIGHLIGHT_START, '<mark>')
+                     .replace(HIGHLIGHT_END, '</mark>'))
+
+
+class SearchPaginator(CursorPaginator):
+    """Ранжированная keyset-выдача: ключ (bm25, id), лучшие первыми."""
+
+    def __init__(self, query, index=posts_index, per_page=PER_PAGE,
+                 transform=None):
+        super().__init__(None, per_page, ordering=('score', 'id'),
+                         transform=transform)
+        self.query = match_query(query)
+        self.index = index
+
+    def fetch(self, cursor=None, reverse=False, limit=None):
+        if not self.query:
+            return []
+        table = self.index.table
+        sql = (
+            'SELECT id, score, snippet FROM ('
+            ' SELECT rowid AS id, bm25({table}) AS score,'
+            " snippet({table}, 0, %s, %s, '…', %s) AS snippet"
+            ' FROM {table} WHERE {table} MATCH %s)'.format(table=table))
+        params = [HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS,
+                  self.query]
+        if cursor is not None:
+            sign = '<' if reverse else '>'
+            sql += (' WHERE score {0} %s OR (score = %s AND id {0} %s)'
+                    .format(sign))
+            params += [cursor[0], cursor[0], cursor[1]]
+        order = 'DESC' if reverse else 'ASC'
+        sql += ' ORDER BY score {0}, id {0} LIMIT %s'.format(order)
+        params.append(limit if limit is not None else -1)
+        with connection.cursor() as db:
+            db.execute(sql, params)
+            return [{'id': pk, 'score': score, 'snippet': snippet}
+                    for pk, score, snippet in db.fetchall()]
+
+    def convert(self, values):
+        try:
+            return [float(values[0]), int(values[1])]
+        except (TypeError, ValueError):
+            raise InvalidCursor(values)
+
+
+def _attach_posts(rows):
+    from .models import Post
+    posts = (Post.objects.select_related('author', 'group')
+             .in_bulk([row['id'] for row in rows]))
+    found = []
+    for row in rows:
+        post = posts.get(row['id'])
+        if post is not None:
+            post.snippet = highlight(row['snippet'])
+            found.append(post)
+    return found
+
+
+def search_page(query, params, per_page=PER_PAGE):
+    if not posts_index.available:
+        from .models import Post
+        posts = Post.objects.select_related('author', 'group')
+        if not query:
+            posts = posts.none()
+        paginator = CursorPaginator(posts.filter(text__icontains=query),
+                                    per_page)
+        return paginator.get_page(params)
+    return SearchPaginator(query, per_page=per_page,
+                           transform=_attach_posts).get_page(params)
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, counters, images, timeline
+from .search import comments_index, posts_index
+from .models import AuthorStats, Comment, Follow, Post
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        # Пост могли перенести в другую группу: ее ленту тоже сбрасываем.
+        instance._previous_group_ids = list(
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = cache.post_scopes(
+        instance, getattr(instance, '_previous_group_ids', ()))
+    if not created:
+        scopes.add('trending')
+    cache.bump(*scopes)
+    posts_index.update(instance.pk, instance.text)
+    renditions = getattr(instance, '_renditions', None)
+    if renditions:
+        images.save_renditions(instance.image.name, renditions)
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    cache.bump('trending', *cache.post_scopes(instance))
+    posts_index.remove(instance.pk)
+    counters.change_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    comments_index.update(instance.pk, instance.text)
+    if created:
+        counters.change_user(instance.author_id, 'comments_count', 1)
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    comments_index.remove(instance.pk)
+    counters.change_user(instance.author_id, 'comments_count', -1)
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        if instance.user_id and instance.author_id:
+            timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    if instance.user_id and instance.author_id:
+        timeline.remove_author(instance.user_id, instance.author_id)
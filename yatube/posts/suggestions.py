@@ -0,0 +1,146 @@
+import heapq
+from array import array
+from collections import Counter
+
+from core.db import serialized
+from .models import Follow, Suggestion
+
+TOP = 10
+BATCH_SIZE = 1000
+CHUNK_SIZE = 10000
+# Сколько соседей узла просматривается: ограничивает работу для тех,
+# кто подписан на очень многих, и для авторов с миллионами подписчиков.
+FANOUT_LIMIT = 1000
+# Подписчик, на которого пользователь еще не подписан, весит как столько
+# общих подписок.
+MUTUAL_WEIGHT = 2
+
+
+class Graph:
+    """Граф подписок в формате CSR.
+
+    Узлы — id пользователей. Подписки узла u — это
+    following[1][following[0][u]:following[0][u + 1]], подписчики —
+    то же для followers. Связь занимает по 4 байта в каждом направлении,
+    смещения — по 8 байт на узел, объектов на связь не создается.
+    """
+
+    def __init__(self, sources, targets):
+        self.size = max(max(sources, default=0),
+                        max(targets, default=0)) + 1
+        self.following = self._csr(sources, targets, self.size)
+        self.followers = self._csr(targets, sources, self.size)
+
+    @classmethod
+    def load(cls, chunk_size=CHUNK_SIZE):
+        sources, targets = array('i'), array('i')
+        edges = (Follow.objects.filter(user__isnull=False,
+                                       author__isnull=False)
+                 .order_by().values_list('user_id', 'author_id')
+                 .iterator(chunk_size=chunk_size))
+        for user_id, author_id in edges:
+            sources.append(user_id)
+            targets.append(author_id)
+        return cls(sources, targets)
+
+    @staticmethod
+    def _csr(sources, targets, size):
+        offsets = array('q', bytes(8 * (size + 1)))
+        for source in sources:
+            offsets[source + 1] += 1
+        for node in range(size):
+            offsets[node + 1] += offsets[node]
+        position = array('q', offsets)
+        neighbours = array('i', bytes(4 * len(targets)))
+        for source, target in zip(sources, targets):
+            neighbours[position[source]] = target
+            position[source] += 1
+        return offsets, neighbours
+
+    @staticmethod
+    def _neighbours(csr, node, limit=FANOUT_LIMIT):
+        offsets, neighbours = csr
+        start = offsets[node]
+        return neighbours[start:min(offsets[node + 1], start + limit)]
+
+    def following_of(self, node, limit=FANOUT_LIMIT):
+        return self._neighbours(self.following, node, limit)
+
+    def followers_of(self, node, limit=FANOUT_LIMIT):
+        return self._neighbours(self.followers, node, limit)
+
+    def nodes(self):
+        """Узлы, у которых есть хотя бы одна связь, по возрастанию id."""
+        following, followers = self.following[0], self.followers[0]
+        for node in range(self.size):
+            if (following[node] != following[node + 1]
+                    or followers[node] != followers[node + 1]):
+                yield node
+
+    @property
+    def nbytes(self):
+        return sum(part.itemsize * len(part)
+                   for csr in (self.following, self.followers)
+                   for part in csr)
+
+
+def suggest(graph, user_id, top=TOP):
+    """Лучшие кандидаты [(id, score)]: авторы, на которых подписаны
+    авторы пользователя, и его подписчики без взаимной подписки.
+    """
+    following = graph.following_of(user_id, limit=graph.size)
+    seen = set(following)
+    seen.add(user_id)
+    scores = Counter()
+    for author_id in following[:FANOUT_LIMIT]:
+        for candidate in graph.following_of(author_id):
+            if candidate not in seen:
+                scores[candidate] += 1
+    for follower_id in graph.followers_of(user_id):
+        if follower_id not in seen:
+            scores[follower_id] += MUTUAL_WEIGHT
+    return heapq.nlargest(top, scores.items(),
+                          key=lambda item: (item[1], -item[0]))
+
+
+@serialized
+def store(after, until, found):
+    """Заменяет подсказки пользователей с id в (after, until]."""
+    users = Suggestion.objects.filter(user_id__gt=after)
+    if until is not None:
+        users = users.filter(user_id__lte=until)
+    users.delete()
+    Suggestion.objects.bulk_create(
+        [Suggestion(user_id=user_id, suggested_id=suggested_id, score=score)
+         for user_id, candidates in found.items()
+         for suggested_id, score in candidates])
+
+
+def recompute(graph=None, top=TOP, batch_size=BATCH_SIZE):
+    """Полный пересчет. Пользователи идут по возрастанию id, и каждая
+    пачка заменяет подсказки всего своего диапазона id — так удаляются
+    и подсказки тех, у кого связей больше нет.
+    """
+    graph = graph or Graph.load()
+    stats = {'users': 0, 'suggestions': 0}
+    found = {}
+    last = 0
+    for user_id in graph.nodes():
+        candidates = suggest(graph, user_id, top)
+        if candidates:
+            found[user_id] = candidates
+            stats['suggestions'] += len(candidates)
+        stats['users'] += 1
+        if len(found) >= batch_size:
+            store(last, user_id, found)
+            found = {}
+            last = user_id
+    store(last, None, found)
+    return stats
+
+
+def for_user(user, limit=TOP):
+    """Подсказки без тех, на кого пользователь уже подписался."""
+    return (Suggestion.objects.filter(user=user)
+            .exclude(suggested__following__user=user)
+            .select_related('suggested').order_by('-score')[:limit])
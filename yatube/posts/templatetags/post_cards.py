@@ -0,0 +1,54 @@
+import zlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_KEY = 'post-card:%s:%d:%s:%x'
+
+
+def card_key(post, variant):
+    """Ключ карточки: id и время изменения поста плюс то, что меняется
+    без изменения поста, — имя автора, группа и готовность картинок.
+    """
+    related = '%s|%s|%s' % (post.author.get_full_name(),
+                            post.group.slug if post.group else '',
+                            post.renditions)
+    return CARD_KEY % (variant, post.id, post.updated.timestamp(),
+                       zlib.crc32(related.encode()))
+
+
+@register.simple_tag
+def post_cards(posts, variant='feed'):
+    """Карточки постов страницы: все читаются из кэша одним get_many,
+    рендерятся только недостающие и сохраняются одним set_many.
+    Карточки с оригиналом вместо еще не готовой миниатюры не кэшируются.
+    """
+    posts = list(posts)
+    keys = [card_key(post, variant) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    card = get_template('posts/includes/post_card.html')
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            cards[key] = card.render({'post': post, 'variant': variant})
+            if not getattr(post, 'image_fallback', False):
+                missing[key] = cards[key]
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+    html = []
+    for number, (key, post) in enumerate(zip(keys, posts), 1):
+        html.append(cards[key])
+        if variant == 'trending':
+            # Счетчик меняется без правки поста, поэтому он вне карточки.
+            html.append(format_html('<p>Комментариев: {}</p>',
+                                    post.comments_count))
+        if number < len(keys):
+            html.append('<hr>')
+        html.append('<br>')
+    return mark_safe('\n'.join(html))
@@ -0,0 +1,19 @@
+from django import template
+
+from posts import images, thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, kind='feed'):
+    """Картинка поста с srcset из готовых вариантов; для постов без
+    вариантов — миниатюра sorl или оригинал.
+    """
+    sources = images.sources(post, kind)
+    if sources is None:
+        src = thumbnails.thumbnail_url(post.image)
+        # Оригинал временный: карточку с ним post_cards не кэширует.
+        post.image_fallback = src == post.image.url
+        return {'src': src}
+    return sources
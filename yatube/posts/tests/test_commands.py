@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .. import images, thumbnails
+from ..management.commands import import_content
+from ..models import Comment, ImportCheckpoint, Post
+from ..search import comments_index, posts_index
+from .test_images import make_jpeg
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ImportContentTest(TestCase):
+    def setUp(self):
+        self.source = tempfile.NamedTemporaryFile(
+            'w', suffix='.jsonl', delete=False, encoding='utf-8')
+        records = [
+            {'type': 'user', 'username': 'leo'},
+            {'type': 'group', 'slug': 'prose', 'title': 'Проза'},
+            {'type': 'post', 'id': 500, 'author': 'leo', 'group': 'prose',
+             'text': 'Все счастливые семьи', 'pub_date': '1877-01-01T00:00'},
+            {'type': 'comment', 'post': 500, 'author': 'leo',
+             'text': 'Комментарий', 'created': '1877-01-02T00:00:00Z'},
+        ]
+        for record in records:
+            self.source.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.source.close()
+        self.addCleanup(os.remove, self.source.name)
+
+    def test_import_keeps_dates_and_resumes(self):
+        """Импорт сохраняет даты источника и продолжает с чекпоинта."""
+        call_command('import_content', self.source.name, batch_size=2,
+                     stdout=StringIO())
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.author.username, 'leo')
+        self.assertEqual(post.group.slug, 'prose')
+        self.assertEqual(post.pub_date.year, 1877)
+        self.assertEqual(Comment.objects.get().created.day, 2)
+        self.assertTrue(Post.objects.filter(
+            pk__in=posts_index.matching_ids('счастливые')).exists())
+        self.assertTrue(Comment.objects.filter(
+            pk__in=comments_index.matching_ids('комментарий')).exists())
+        call_command('import_content', self.source.name, resume=True,
+                     stdout=StringIO())
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_failed_batch_keeps_checkpoint(self):
+        """Сбой до записи позиции откатывает и порцию: повтор без дублей."""
+        write_checkpoint = import_content.Command.write_checkpoint
+
+        def fail_on_comments(command, line):
+            if line == 4:
+                raise RuntimeError('Сбой')
+            write_checkpoint(command, line)
+
+        with mock.patch.object(import_content.Command, 'write_checkpoint',
+                               fail_on_comments):
+            with self.assertRaises(RuntimeError):
+                call_command('import_content', self.source.name,
+                             batch_size=2, stdout=StringIO())
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(ImportCheckpoint.objects.get().line, 2)
+        for _ in range(2):
+            call_command('import_content', self.source.name, resume=True,
+                         stdout=StringIO())
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CollectMediaTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, client):
+        client.post(reverse('posts:post_create'),
+                    {'text': 'Пост', 'image': make_jpeg()})
+        post = Post.objects.latest('id')
+        thumbnail = thumbnails.generate(post.image.name)
+        return post, thumbnail
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command('collect_media', '--min-age=0', '--rate=0', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_unreferenced_media_is_removed(self):
+        client = Client()
+        client.force_login(User.objects.create_user(username='author'))
+        kept, kept_thumbnail = self.upload(client)
+        deleted, deleted_thumbnail = self.upload(client)
+        deleted_files = [deleted.image.name, deleted_thumbnail.name,
+                         images.rendition_name(deleted.image.name, 'feed',
+                                               960, 'webp')]
+        kept_files = [kept.image.name, kept_thumbnail.name,
+                      images.rendition_name(kept.image.name, 'feed',
+                                            960, 'webp')]
+        deleted.delete()
+        stray = default_storage.save('posts/stray.jpg', ContentFile(b'x'))
+        deleted_files.append(stray)
+
+        report = self.collect('--dry-run')
+        self.assertIn('к удалению', report)
+        for name in deleted_files + kept_files:
+            self.assertTrue(default_storage.exists(name), name)
+
+        self.collect()
+        for name in deleted_files:
+            self.assertFalse(default_storage.exists(name), name)
+        for name in kept_files:
+            self.assertTrue(default_storage.exists(name), name)
+        self.assertFalse(os.path.exists(default_storage.path(
+            os.path.dirname(deleted_files[2]))))
+        self.assertIsNone(default.kvstore.get(ImageFile(deleted.image.name)))
+        self.assertIsNotNone(default.kvstore.get(ImageFile(kept.image.name)))
+        self.assertIsNotNone(default.kvstore.get(kept_thumbnail))
+
+    def test_recent_files_are_kept(self):
+        stray = default_storage.save('posts/stray.jpg', ContentFile(b'x'))
+        call_command('collect_media', '--rate=0', stdout=StringIO())
+        self.assertTrue(default_storage.exists(stray))
@@ -0,0 +1,89 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import digests
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.readers = [
+            User.objects.create_user(username='reader%d' % number,
+                                     email='reader%d@example.com' % number)
+            for number in range(3)]
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+        User.objects.create_user(username='silent', email='s@example.com')
+
+    def publish(self, count):
+        start = Post.objects.count()
+        return [Post.objects.create(author=self.author, text='Пост %d' % n)
+                for n in range(start, start + count)]
+
+    def test_digest_contains_only_unseen_posts(self):
+        posts = self.publish(2)
+        stats = digests.send_digests()
+        self.assertEqual(stats, {'users': 3, 'sent': 3})
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['reader%d@example.com' % n for n in range(3)])
+        body = mail.outbox[0].body
+        self.assertLess(body.index(posts[1].text), body.index(posts[0].text))
+        self.assertIn('/posts/%d/' % posts[0].id, body)
+
+        mail.outbox = []
+        digests.send_digests()
+        self.assertEqual(mail.outbox, [])
+
+        new_post = self.publish(1)[0]
+        digests.send_digests()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn(new_post.text, mail.outbox[0].body)
+        self.assertNotIn(posts[0].text, mail.outbox[0].body)
+
+    def test_first_digest_covers_digest_period(self):
+        old = self.publish(1)[0]
+        two_days_ago = timezone.now() - datetime.timedelta(days=2)
+        Post.objects.filter(pk=old.pk).update(pub_date=two_days_ago)
+        TimelineEntry.objects.filter(post=old).update(pub_date=two_days_ago)
+        new = self.publish(1)[0]
+        digests.send_digests()
+        self.assertIn(new.text, mail.outbox[0].body)
+        self.assertNotIn(old.text, mail.outbox[0].body)
+
+    def test_queries_do_not_grow_with_followers(self):
+        """На пачку — постоянное число запросов, письма одной отправкой."""
+        self.publish(12)
+        with self.assertNumQueries(7):
+            digests.send_digests(batch_size=10, max_posts=5)
+        self.assertIn('И еще постов: 7', mail.outbox[0].body)
+        for number in range(3, 8):
+            reader = User.objects.create_user(
+                username='reader%d' % number,
+                email='reader%d@example.com' % number)
+            Follow.objects.create(user=reader, author=self.author)
+        self.publish(1)
+        with self.assertNumQueries(7):
+            digests.send_digests(batch_size=10)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_hot_authors_are_included(self):
+        post = self.publish(1)[0]
+        digests.send_digests()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn(post.text, mail.outbox[0].body)
+
+    def test_shards_split_followers(self):
+        self.publish(1)
+        for shard in range(2):
+            call_command('send_digests', shard=shard, shards=2,
+                         stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
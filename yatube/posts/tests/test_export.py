@@ -0,0 +1,96 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+        cls.posts = [Post.objects.create(author=cls.author,
+                                         text='Пост %d' % number)
+                     for number in range(5)]
+        cls.own = Post.objects.create(author=cls.user, text='Свой пост')
+        Comment.objects.create(post=cls.own, author=cls.user, text='Ответ')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def download(self, client, url):
+        response = client.get(url)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_own_export_contains_only_own_rows(self):
+        url = reverse('posts:export', args=['posts'])
+        lines = self.download(self.client, url).decode().splitlines()
+        self.assertEqual([json.loads(line)['text'] for line in lines],
+                         ['Свой пост'])
+        url = reverse('posts:export', args=['follows'])
+        record = json.loads(self.download(self.client, url))
+        self.assertEqual(record['author__username'], 'author')
+
+    def test_staff_export_resumes_by_id(self):
+        url = reverse('posts:export_all', args=['posts']) + '?format=csv'
+        rows = list(csv.reader(io.StringIO(
+            self.download(self.staff_client, url).decode())))
+        self.assertEqual(rows[0][0], 'id')
+        self.assertEqual(len(rows), 1 + len(self.posts) + 1)
+        after = rows[3][0]
+        rest = list(csv.reader(io.StringIO(self.download(
+            self.staff_client, url + '&after=' + after).decode())))
+        self.assertEqual(rest, rows[4:])
+
+    def test_gzip_export(self):
+        url = reverse('posts:export_all', args=['comments']) + '?gzip=1'
+        response = self.staff_client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('comments.ndjson.gz',
+                      response['Content-Disposition'])
+        data = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(json.loads(data)['text'], 'Ответ')
+
+    def test_full_export_requires_staff(self):
+        response = self.client.get(
+            reverse('posts:export_all', args=['posts']))
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(reverse('posts:export', args=['users']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command_writes_to_given_stdout(self):
+        out = io.BytesIO()
+        call_command('export_data', 'follows', user='reader', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['author__username'],
+                         'author')
+
+    def test_export_command_appends_on_resume(self):
+        path = tempfile.mktemp(suffix='.csv')
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        call_command('export_data', 'posts', format='csv', output=path,
+                     after=self.posts[2].id)
+        call_command('export_data', 'posts', format='csv', output=path,
+                     after=self.posts[-1].id, chunk_size=1)
+        with open(path, encoding='utf-8') as exported:
+            ids = [int(row[0]) for row in csv.reader(exported)]
+        self.assertEqual(ids, [self.posts[3].id, self.posts[4].id,
+                               self.own.id, self.own.id])
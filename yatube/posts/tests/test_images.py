@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg(size=(400, 200), orientation=None):
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    if orientation:
+        exif[images.ORIENTATION] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImagePipelineTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_upload_writes_clean_original_and_renditions(self):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Пост', 'image': make_jpeg(orientation=6)})
+        post = Post.objects.get()
+        self.assertEqual(post.renditions, images.RENDITIONS_VERSION)
+        with default_storage.open(post.image.name) as file:
+            original = Image.open(file)
+            self.assertEqual(original.size, (200, 400))
+            self.assertEqual(dict(original.getexif()), {})
+        for kind, sizes in images.SIZES.items():
+            for width, height in sizes:
+                for extension in images.FORMATS:
+                    name = images.rendition_name(post.image.name, kind,
+                                                 width, extension)
+                    with self.subTest(name=name):
+                        self.assertTrue(default_storage.exists(name))
+        with default_storage.open(images.rendition_name(
+                post.image.name, 'feed', 960, 'webp')) as file:
+            self.assertEqual(Image.open(file).size, (960, 339))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'feed-480.jpg 480w')
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.id]))
+        self.assertContains(response, 'detail-800.webp 800w')
+
+    @override_settings(IMAGE_MAX_PIXELS=100 * 100)
+    def test_oversized_image_is_rejected_before_decoding(self):
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Пост', 'image': make_jpeg()})
+        self.assertFormError(response, 'form', 'image',
+                             'Изображение слишком большое (400 × 200).')
+        self.assertFalse(Post.objects.exists())
+
+    def test_warm_thumbnails_builds_missing_renditions(self):
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   image=make_jpeg())
+        self.assertEqual(post.renditions, 0)
+        outdated = Post.objects.create(author=self.user, text='Старый',
+                                       image=make_jpeg())
+        Post.objects.filter(pk=outdated.pk).update(
+            renditions=images.RENDITIONS_VERSION - 1)
+        outdated.refresh_from_db()
+        self.assertIsNone(images.sources(outdated, 'feed'))
+        call_command('warm_thumbnails', stdout=StringIO())
+        outdated.refresh_from_db()
+        self.assertEqual(outdated.renditions, images.RENDITIONS_VERSION)
+        post.refresh_from_db()
+        self.assertEqual(post.renditions, images.RENDITIONS_VERSION)
+        self.assertTrue(default_storage.exists(images.rendition_name(
+            post.image.name, 'detail', 1600, 'jpg')))
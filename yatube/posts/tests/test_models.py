@@ -1,7 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -26,3 +30,88 @@ class PostModelGroupTest(TestCase):
 
     def test_models_have_correct_object_names(self):
         self.assertEqual(self.group.title, str(self.group))
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_saves_and_deletes(self):
+        """Счетчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='text')
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='comment')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).comments_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_recount_fixes_drift(self):
+        """Команда recount исправляет разошедшиеся счетчики."""
+        post = Post.objects.create(author=self.author, text='text')
+        Comment.objects.create(post=post, author=self.reader, text='text')
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        call_command('recount', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
+
+
+class QueryPlanTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(slug='slug', description='')
+        self.post = Post.objects.create(author=self.user, group=self.group,
+                                        text='text')
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_feed_queries_use_composite_indexes(self):
+        """Запросы лент читают составные индексы без сортировки."""
+        feeds = {
+            'post_pub_date_idx': Post.objects.order_by('-pub_date', '-id'),
+            'post_author_pub_date_idx': Post.objects.filter(
+                author=self.user).order_by('-pub_date', '-id'),
+            'post_group_pub_date_idx': Post.objects.filter(
+                group=self.group).order_by('-pub_date', '-id'),
+            'comment_post_created_idx': Comment.objects.filter(
+                post=self.post).order_by('-created'),
+        }
+        for index, queryset in feeds.items():
+            with self.subTest(index=index):
+                plan = self.plan(queryset[:10])
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_follow_lookup_uses_unique_index(self):
+        author = User.objects.create_user(username='author')
+        plan = self.plan(Follow.objects.filter(user=self.user, author=author))
+        self.assertIn('user_id=? AND author_id=?', plan)
+
+    def test_follow_is_unique(self):
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.user, author=author)
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(slug='group', description='')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.post = self.add_posts(1)[0]
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def add_posts(self, count):
+        posts = []
+        for number in range(count):
+            post = Post.objects.create(author=self.author, group=self.group,
+                                       text='Пост %d' % number)
+            Comment.objects.create(post=post, author=self.user, text='text')
+            posts.append(post)
+        return posts
+
+    def urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+        ]
+
+    def test_read_views_fit_query_budget(self):
+        """Число запросов не растет вместе с размером страницы."""
+        small = {}
+        for url in self.urls():
+            with self.subTest(url=url):
+                _, small[url] = self.assertWithinQueryBudget(
+                    self.authorized_client, url)
+        self.add_posts(15)
+        for _ in range(15):
+            Comment.objects.create(post=self.post, author=self.author,
+                                   text='text')
+        for url in self.urls():
+            with self.subTest(url=url):
+                _, queries = self.assertWithinQueryBudget(
+                    self.authorized_client, url)
+                self.assertEqual(queries, small[url])
+
+    def test_guest_views_fit_query_budget(self):
+        for url in self.urls()[:4]:
+            with self.subTest(url=url):
+                self.assertWithinQueryBudget(Client(), url)
+
+    def test_post_edit_fits_query_budget(self):
+        self.authorized_client.force_login(self.author)
+        self.assertWithinQueryBudget(
+            self.authorized_client,
+            reverse('posts:post_edit', args=[self.post.id]))
@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(reverse('posts:search'), {'q': query,
+                                                         **params})
+
+    def test_search_ranks_and_highlights(self):
+        """Поиск находит посты, ранжирует и подсвечивает совпадения."""
+        Post.objects.create(author=self.user, text='Про котов и собак')
+        best = Post.objects.create(author=self.user,
+                                   text='Коты, коты и снова коты')
+        Post.objects.create(author=self.user, text='Только про собак')
+        response = self.search('коты')
+        self.assertEqual(list(response.context['page_obj']), [best])
+        self.assertContains(response, '<mark>Коты</mark>')
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(author=self.user, text='старый текст')
+        post.text = 'новый текст'
+        post.save()
+        self.assertEqual(len(self.search('старый').context['page_obj']), 0)
+        self.assertEqual(len(self.search('новый').context['page_obj']), 1)
+        post.delete()
+        self.assertEqual(len(self.search('новый').context['page_obj']), 0)
+
+    def test_search_is_keyset_paginated(self):
+        posts = {Post.objects.create(author=self.user, text='слово %d' % n)
+                 for n in range(13)}
+        first = self.search('слово')
+        page_obj = first.context['page_obj']
+        found = set(page_obj)
+        self.assertEqual(len(found), 10)
+        second = self.search('слово', cursor=page_obj.next_cursor)
+        found |= set(second.context['page_obj'])
+        self.assertEqual(found, posts)
+        self.assertContains(
+            first, '?q=%D1%81%D0%BB%D0%BE%D0%B2%D0%BE&amp;cursor=')
+
+    def test_rebuild_indexes_bulk_created_posts(self):
+        Post.objects.bulk_create([Post(author=self.user, text='импорт')])
+        self.assertEqual(len(self.search('импорт').context['page_obj']), 0)
+        call_command('rebuild_search_index', batch_size=1,
+                     stdout=StringIO())
+        self.assertEqual(len(self.search('импорт').context['page_obj']), 1)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        Post.objects.create(author=self.user, text='иголка в стоге')
+        Post.objects.create(author=self.user, text='просто сено')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'иголка'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_comment_admin_searches_text_and_author(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        post = Post.objects.create(author=self.user, text='пост')
+        reader = User.objects.create_user(username='reader')
+        Comment.objects.create(post=post, author=self.user,
+                               text='отличная статья')
+        Comment.objects.create(post=post, author=reader, text='согласен')
+        self.client.force_login(admin)
+        url = reverse('admin:posts_comment_changelist')
+        for query in ('статья', 'reader'):
+            with self.subTest(query=query):
+                response = self.client.get(url, {'q': query})
+                self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_admin_changelists_render(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        post = Post.objects.create(author=self.user, text='пост')
+        Comment.objects.create(post=post, author=self.user, text='текст')
+        self.client.force_login(admin)
+        for name in ('posts_post', 'posts_comment'):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse('admin:%s_changelist' % name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import suggestions
+from ..models import Follow, Suggestion
+
+User = get_user_model()
+
+
+class SuggestionTests(TestCase):
+    def setUp(self):
+        self.users = {name: User.objects.create_user(username=name)
+                      for name in ('anna', 'boris', 'vera', 'gleb', 'dina')}
+        for user, author in [('anna', 'boris'), ('anna', 'vera'),
+                             ('boris', 'gleb'), ('vera', 'gleb'),
+                             ('vera', 'dina'), ('dina', 'anna')]:
+            self.follow(user, author)
+
+    def follow(self, user, author):
+        Follow.objects.create(user=self.users[user],
+                              author=self.users[author])
+
+    def names(self, user_ids):
+        usernames = dict(User.objects.values_list('id', 'username'))
+        return [usernames[user_id] for user_id in user_ids]
+
+    def test_graph_is_compact(self):
+        graph = suggestions.Graph.load()
+        anna = self.users['anna'].id
+        self.assertEqual(self.names(graph.following_of(anna)),
+                         ['boris', 'vera'])
+        self.assertEqual(self.names(graph.followers_of(anna)), ['dina'])
+        self.assertEqual(graph.nbytes, 2 * (8 * (graph.size + 1) + 4 * 6))
+
+    def test_friends_of_friends_and_followers(self):
+        graph = suggestions.Graph.load()
+        found = suggestions.suggest(graph, self.users['anna'].id)
+        self.assertEqual(self.names(user_id for user_id, _ in found),
+                         ['dina', 'gleb'])
+        self.assertEqual([score for _, score in found], [3, 2])
+
+    def test_recompute_replaces_stored_suggestions(self):
+        stats = suggestions.recompute(batch_size=2)
+        self.assertEqual(stats['users'], 5)
+        anna = self.users['anna']
+        self.assertEqual(
+            [item.suggested.username for item in suggestions.for_user(anna)],
+            ['dina', 'gleb'])
+        Follow.objects.exclude(user=anna).delete()
+        call_command('suggest_follows', stdout=StringIO())
+        self.assertFalse(Suggestion.objects.filter(user=anna).exists())
+
+    def test_own_profile_shows_suggestions(self):
+        suggestions.recompute()
+        client = Client()
+        client.force_login(self.users['anna'])
+        url = reverse('posts:profile', args=['anna'])
+        response = client.get(url)
+        self.assertContains(response, 'Кого почитать')
+        self.assertEqual(
+            [item.suggested.username
+             for item in response.context['suggestions']], ['dina', 'gleb'])
+        self.follow('anna', 'dina')
+        response = client.get(url)
+        self.assertEqual(
+            [item.suggested.username
+             for item in response.context['suggestions']], ['gleb'])
+        response = client.get(reverse('posts:profile', args=['boris']))
+        self.assertEqual(response.context['suggestions'], [])
+
+    def test_renamed_suggestion_changes_etag(self):
+        suggestions.recompute()
+        client = Client()
+        client.force_login(self.users['anna'])
+        url = reverse('posts:profile', args=['anna'])
+        etag = client.get(url)['ETag']
+        gleb = self.users['gleb']
+        gleb.first_name = 'Глеб'
+        gleb.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Глеб')
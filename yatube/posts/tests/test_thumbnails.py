@@ -0,0 +1,57 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(
+            author=self.user, text='text',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'))
+
+    def test_original_is_shown_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, лента отдает оригинал и не ресайзит."""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        thumbnail = thumbnails.generate(self.post.image.name)
+        self.assertTrue(thumbnail.name.startswith('cache/'))
+        self.assertEqual(thumbnails.thumbnail_url(self.post.image),
+                         thumbnail.url)
+
+    def test_card_with_original_is_not_cached(self):
+        """Карточка с оригиналом не переживает готовность миниатюры."""
+        cards = Template('{% load post_cards %}{% post_cards posts %}')
+        context = Context({'posts': Post.objects.all()})
+        self.assertIn(self.post.image.url, cards.render(context))
+        thumbnail = thumbnails.generate(self.post.image.name)
+        self.assertIn(thumbnail.url, cards.render(context))
+        self.assertIn(thumbnail.url, cards.render(context))
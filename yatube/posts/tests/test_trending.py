@@ -0,0 +1,90 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Post, TrendingPost, TrendingState
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.posts = [Post.objects.create(author=self.author,
+                                          text='Пост %d' % number)
+                      for number in range(3)]
+
+    def comment(self, post, hours_ago=0):
+        comment = Comment.objects.create(post=post, author=self.author,
+                                         text='Комментарий')
+        created = timezone.now() - datetime.timedelta(hours=hours_ago)
+        Comment.objects.filter(pk=comment.pk).update(created=created)
+        return comment
+
+    def ranking(self):
+        return list(trending.top().values_list('id', flat=True))
+
+    def test_recent_activity_outranks_old(self):
+        for _ in range(3):
+            self.comment(self.posts[0], hours_ago=24)
+        self.comment(self.posts[1])
+        trending.update()
+        self.assertEqual(self.ranking(),
+                         [self.posts[1].id, self.posts[0].id])
+        score = self.posts[1].trending.score
+        self.assertAlmostEqual(trending.decayed(score), 1, places=3)
+
+    def test_update_is_incremental(self):
+        self.comment(self.posts[0])
+        self.comment(self.posts[1])
+        trending.update(batch_size=1)
+        last = TrendingState.objects.get().last_comment_id
+        self.assertEqual(last, Comment.objects.latest('id').id)
+        with self.assertNumQueries(7):
+            self.assertEqual(trending.update()['comments'], 0)
+        self.comment(self.posts[1])
+        self.comment(self.posts[1])
+        trending.update()
+        self.assertEqual(self.ranking(),
+                         [self.posts[1].id, self.posts[0].id])
+        scores = TrendingPost.objects.values_list('score', flat=True)
+        self.assertAlmostEqual(trending.decayed(max(scores)), 3, places=3)
+
+    @override_settings(TRENDING_SIZE=2)
+    def test_cold_posts_are_trimmed(self):
+        self.comment(self.posts[0], hours_ago=24 * 30)
+        self.comment(self.posts[1])
+        self.comment(self.posts[2])
+        self.comment(self.posts[2])
+        trending.update()
+        self.assertEqual(self.ranking(),
+                         [self.posts[2].id, self.posts[1].id])
+        with override_settings(TRENDING_SIZE=1):
+            call_command('update_trending', stdout=StringIO())
+        self.assertEqual(self.ranking(), [self.posts[2].id])
+
+    def test_trending_page_is_cached_until_update(self):
+        self.comment(self.posts[0])
+        trending.update()
+        client = Client()
+        url = reverse('posts:trending')
+        response = client.get(url)
+        self.assertEqual([post.id for post in response.context['posts']],
+                         [self.posts[0].id])
+        self.assertContains(response, 'Популярное')
+        self.assertContains(response, 'Комментариев: 1')
+        self.comment(self.posts[1])
+        self.comment(self.posts[1])
+        self.assertContains(client.get(url), 'Пост 0')
+        self.assertNotContains(client.get(url), 'Пост 1')
+        trending.update()
+        self.assertContains(client.get(url), 'Пост 1')
+        self.posts[1].text = 'Исправленный пост'
+        self.posts[1].save()
+        self.assertContains(client.get(url), 'Исправленный пост')
@@ -1,9 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
+from django.utils import timezone
 from django import forms
 from ..models import Post, Group, Follow
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from unittest import mock
 
 User = get_user_model()
 
@@ -123,22 +125,89 @@ class PostTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_cache_index(self):
-        """Кэш главной страницы работает."""
+        """Кэш главной страницы работает и сбрасывается новым постом."""
         response_old = self.authorized_client.get(reverse('posts:index'))
-        content_old = response_old.content
+        # Карточка поста кэшируется по времени изменения, поэтому правка
+        # в обход сигналов сдвигает и его.
+        Post.objects.filter(pk=self.post.pk).update(text='изменено в обход',
+                                                    updated=timezone.now())
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response_old.content, response.content)
         new_post = Post.objects.create(
             author=self.user,
             text='test text',
             group=self.group
         )
-        response_new = self.authorized_client.get(reverse('posts:index'))
-        content_new = response_new.content
-        self.assertEqual(content_old, content_new)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, new_post.text)
+        self.assertContains(response, 'изменено в обход')
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         first_post = response.context['page_obj'][0]
         self.assertEqual(new_post, first_post)
 
+    def test_cache_is_per_page(self):
+        """Разные страницы ленты кэшируются отдельно."""
+        for number in range(10):
+            Post.objects.create(author=self.user, text='Пост %d' % number)
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, self.post.text)
+
+    def test_conditional_get(self):
+        """Неизмененные страницы отдаются как 304 Not Modified."""
+        urls = [
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                etag = response['ETag']
+                # Last-Modified не учитывает зрителя и подписки.
+                self.assertFalse(response.has_header('Last-Modified'))
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                response = self.authorized_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 '
+                                                'GMT')
+                self.assertEqual(response.status_code, 200)
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get_invalidation(self):
+        """Правка поста, комментарий и подписка меняют ETag."""
+        detail = reverse('posts:post_detail', args=[self.post.id])
+        profile = reverse('posts:profile', args=[self.user.username])
+        reader = User.objects.create_user(username='reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        detail_etag = self.authorized_client.get(detail)['ETag']
+        profile_etag = reader_client.get(profile)['ETag']
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[self.post.id]),
+            {'text': 'Исправленный пост', 'group': self.group.id})
+        response = self.authorized_client.get(
+            detail, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertContains(response, 'Исправленный пост')
+        detail_etag = response['ETag']
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Новый комментарий'})
+        response = self.authorized_client.get(
+            detail, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertContains(response, 'Новый комментарий')
+        response = reader_client.get(profile, HTTP_IF_NONE_MATCH=profile_etag)
+        self.assertEqual(response.status_code, 200)
+        profile_etag = response['ETag']
+        Follow.objects.create(user=reader, author=self.user)
+        response = reader_client.get(profile, HTTP_IF_NONE_MATCH=profile_etag)
+        self.assertContains(response, 'Отписаться')
+
     def test_auth_user_get_follow_author(self):
         """Авторизованный пользователь может подписываться на других
         пользователей.
@@ -228,3 +297,112 @@ class PostPaginatorTests(TestCase):
             self.assertEqual(len(response.context['page_obj']), 10)
             response = self.authorized_client.get(page + '?page=2')
             self.assertEqual(len(response.context['page_obj']), 1)
+
+    def test_cursor_pagination(self):
+        """Курсоры листают ленту вперед и назад без пропусков."""
+        for post in range(14):
+            Post.objects.create(author=self.user, text='text')
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        first_page = list(response.context['page_obj'])
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.guest_client.get(url, {'cursor': next_cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertTrue(page_obj.has_previous())
+        self.assertTrue(page_obj.has_next())
+        self.assertTrue(set(first_page).isdisjoint(page_obj))
+        second_page = list(page_obj)
+        response = self.guest_client.get(
+            url, {'cursor': page_obj.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 5)
+        self.assertFalse(response.context['page_obj'].has_next())
+        response = self.guest_client.get(
+            url, {'cursor': response.context['page_obj'].previous_cursor})
+        self.assertEqual(list(response.context['page_obj']), second_page)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'cursor': 'broken'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class GroupDirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='directory_user')
+        cls.groups = [Group.objects.create(title='Группа %02d' % number,
+                                           slug='group-%02d' % number,
+                                           description='Описание')
+                      for number in range(55)]
+        for number in range(3):
+            Post.objects.create(author=cls.user, group=cls.groups[0],
+                                text='Пост группы %d' % number)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_directory_stats_in_constant_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts:group_index'))
+        first, second = list(response.context['groups'])[:2]
+        self.assertEqual(first.posts_count, 3)
+        self.assertEqual(first.latest_title, 'Пост группы 2')
+        self.assertEqual(second.posts_count, 0)
+        self.assertIsNone(second.last_activity)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts:group_index'))
+
+    def test_directory_keyset_pagination(self):
+        response = self.client.get(reverse('posts:group_index'))
+        self.assertEqual(len(response.context['page_obj']), 50)
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(reverse('posts:group_index'),
+                                   {'cursor': cursor})
+        slugs = [group.slug for group in response.context['groups']]
+        self.assertEqual(slugs[:5],
+                         ['group-%02d' % number for number in range(50, 55)])
+
+    def test_directory_cache_follows_group_posts(self):
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        Post.objects.filter(group=self.groups[0]).update(text='В обход')
+        self.assertNotContains(self.client.get(url), 'В обход')
+        Post.objects.create(author=self.user, group=self.groups[1],
+                            text='Новый пост')
+        self.assertContains(self.client.get(url), 'Новый пост')
+        self.assertContains(self.client.get(url), 'В обход')
+
+
+class PostCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='card_author')
+        self.posts = [Post.objects.create(author=self.user,
+                                          text='Карточка %d' % number)
+                      for number in range(3)]
+
+    def test_cards_are_fetched_in_one_call_per_page(self):
+        backend = caches['default']
+        with mock.patch.object(backend, 'get_many',
+                               wraps=backend.get_many) as get_many:
+            response = self.client.get(reverse('posts:index'))
+        card_calls = [call for call in get_many.call_args_list
+                      if str(call[0][0][0]).startswith('post-card:')]
+        self.assertEqual(len(card_calls), 1)
+        self.assertEqual(len(card_calls[0][0][0]), 3)
+        self.assertContains(response, 'Карточка 2')
+
+    def test_card_is_reused_until_post_changes(self):
+        url = reverse('posts:profile', args=[self.user.username])
+        self.client.get(url)
+        Post.objects.filter(pk=self.posts[0].pk).update(text='В обход')
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.client.get(url)
+        self.assertContains(response, 'Новый пост')
+        self.assertContains(response, 'Карточка 0')
+        self.posts[0].text = 'Исправлено'
+        self.posts[0].save()
+        self.assertContains(self.client.get(url), 'Исправлено')
@@ -0,0 +1,93 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+class Backend(ThumbnailBackend):
+    def ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из kvstore или None — без декодирования."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = Backend()
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def generate(name):
+    """Создает миниатюру ленты для картинки name (путь в хранилище)."""
+    return backend.get_thumbnail(name, FEED_GEOMETRY, **FEED_OPTIONS)
+
+
+def _generate_in_background(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        connections.close_all()
+
+
+def schedule(image):
+    """Ставит генерацию миниатюры в фоновый пул после коммита."""
+    if not image:
+        return
+    name = image.name
+
+    def submit():
+        with _lock:
+            if name in _pending:
+                return
+            _pending.add(name)
+        _get_executor().submit(_generate_in_background, name)
+
+    transaction.on_commit(submit)
+
+
+def thumbnail_url(image):
+    """URL готовой миниатюры; пока ее нет — оригинал и фоновая генерация.
+    """
+    if not image:
+        return ''
+    ready = backend.ready_thumbnail(image.name, FEED_GEOMETRY,
+                                    **FEED_OPTIONS)
+    if ready:
+        return ready.url
+    schedule(image)
+    return image.url
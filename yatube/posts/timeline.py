@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.db.models import F
+
+from core.paginator import CursorPaginator, PER_PAGE
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def is_hot(author_id):
+    """Слишком популярный автор: его посты читаются при запросе ленты."""
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT).exists()
+
+
+def hot_authors(user):
+    return list(AuthorStats.objects.filter(
+        user__following__user=user,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True))
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_hot(post.author_id):
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .exclude(user=None)
+                 .values_list('user_id', flat=True)
+                 .iterator(chunk_size=BATCH_SIZE))
+    batch = []
+    for user_id in followers:
+        batch.append(TimelineEntry(user_id=user_id,
+                                   post_id=post.id,
+                                   author_id=post.author_id,
+                                   pub_date=post.pub_date))
+        if len(batch) >= BATCH_SIZE:
+            _bulk_insert(batch)
+            batch = []
+    if batch:
+        _bulk_insert(batch)
+
+
+def backfill(user_id, author_id=None):
+    """Заполняет ленту последними постами авторов, на которых подписан
+    пользователь (или одного автора), и обрезает ее до TIMELINE_LENGTH.
+    """
+    posts = Post.objects.filter(author__following__user_id=user_id)
+    if author_id is not None:
+        if is_hot(author_id):
+            return
+        posts = Post.objects.filter(author_id=author_id)
+    posts = (posts.order_by('-pub_date', '-id')
+             .values_list('id', 'author_id', 'pub_date')
+             [:settings.TIMELINE_LENGTH])
+    _bulk_insert([TimelineEntry(user_id=user_id,
+                                post_id=post_id,
+                                author_id=post_author_id,
+                                pub_date=pub_date)
+                  for post_id, post_author_id, pub_date in posts])
+    trim(user_id)
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def trim(user_id, length=None):
+    """Оставляет в ленте только length самых свежих записей."""
+    length = length or settings.TIMELINE_LENGTH
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    paginator = CursorPaginator(entries, ordering=('-pub_date', '-post_id'))
+    edge = list(paginator.ordered(entries)
+                .values_list('pub_date', 'post_id')[length - 1:length + 1])
+    if len(edge) < 2:
+        return 0
+    deleted, _ = entries.filter(paginator.after(edge[0])).delete()
+    return deleted
+
+
+def _posts(rows):
+    return [row.post if isinstance(row, TimelineEntry) else row
+            for row in rows]
+
+
+def feed_sources(user):
+    """Источники ленты с полями ключа pub_date и post_id."""
+    sources = [TimelineEntry.objects.filter(user=user)]
+    hot = hot_authors(user)
+    if hot:
+        sources.append(Post.objects.filter(author_id__in=hot)
+                       .annotate(post_id=F('id')))
+    return sources
+
+
+def feed_paginator(user, per_page=PER_PAGE):
+    """Лента подписок: диапазон своей таблицы плюс посты популярных
+    авторов, которые не раскладывались при публикации.
+    """
+    own, *hot = feed_sources(user)
+    sources = [own.select_related('post__author', 'post__group')]
+    sources += [source.select_related('author', 'group') for source in hot]
+    return CursorPaginator(sources, per_page,
+                           ordering=('-pub_date', '-post_id'),
+                           transform=_posts)
@@ -0,0 +1,98 @@
+import datetime
+import math
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.db import serialized
+from .cache import bump
+from .models import Comment, Post, TrendingPost, TrendingState
+
+BATCH_SIZE = 1000
+# Точка отсчета времени для оценок; любая фиксированная дата подходит.
+EPOCH = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def weight(moment):
+    """Логарифм веса события в момент moment: λ·(moment − EPOCH)."""
+    rate = math.log(2) / settings.TRENDING_HALF_LIFE.total_seconds()
+    return rate * (moment - EPOCH).total_seconds()
+
+
+def logaddexp(first, second):
+    """log(exp(first) + exp(second)) без переполнения."""
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def decayed(score, now=None):
+    """Текущая оценка: сумма 2^(−возраст/полураспад) по комментариям."""
+    return math.exp(score - weight(now or timezone.now()))
+
+
+@serialized
+def apply(state, batch):
+    """Добавляет пачку комментариев (id, post_id, created) к оценкам и
+    сдвигает водяной знак в той же транзакции.
+    """
+    scores = {}
+    for _, post_id, created in batch:
+        score = weight(created)
+        if post_id in scores:
+            score = logaddexp(scores[post_id], score)
+        scores[post_id] = score
+    known = TrendingPost.objects.in_bulk(scores)
+    for post_id, entry in known.items():
+        entry.score = logaddexp(entry.score, scores.pop(post_id))
+    TrendingPost.objects.bulk_update(known.values(), ['score'])
+    TrendingPost.objects.bulk_create(
+        [TrendingPost(post_id=post_id, score=score)
+         for post_id, score in scores.items()])
+    state.last_comment_id = batch[-1][0]
+    state.save(update_fields=['last_comment_id'])
+
+
+@serialized
+def trim(now, size):
+    """Удаляет остывшие посты и все, что не вошло в первые size."""
+    threshold = weight(now) + math.log(settings.TRENDING_MIN_SCORE)
+    removed = TrendingPost.objects.filter(score__lt=threshold).delete()[0]
+    tail = (TrendingPost.objects.order_by('-score', 'post_id')
+            .values('pk')[size:])
+    removed += TrendingPost.objects.filter(pk__in=tail).delete()[0]
+    return removed
+
+
+def update(batch_size=BATCH_SIZE, now=None):
+    """Учитывает комментарии после водяного знака и подрезает рейтинг.
+
+    Старые оценки не пересчитываются: затухание — общий множитель, и
+    для сравнения постов его можно не применять. Поэтому каждый запуск
+    читает только новые комментарии, пачками по первичному ключу.
+    """
+    now = now or timezone.now()
+    state, _ = TrendingState.objects.get_or_create(pk=1)
+    comments = Comment.objects.order_by('id').values_list(
+        'id', 'post_id', 'created')
+    stats = {'comments': 0, 'removed': 0}
+    while True:
+        batch = list(comments.filter(
+            id__gt=state.last_comment_id)[:batch_size])
+        if not batch:
+            break
+        apply(state, batch)
+        stats['comments'] += len(batch)
+    stats['removed'] = trim(now, settings.TRENDING_SIZE)
+    state.updated = now
+    state.save(update_fields=['updated'])
+    if stats['comments'] or stats['removed']:
+        bump('trending')
+    return stats
+
+
+def top(limit=None):
+    """Первые посты рейтинга, прямо из таблицы по индексу оценки."""
+    return (Post.objects.filter(trending__isnull=False)
+            .select_related('author', 'group', 'trending')
+            .order_by('-trending__score')
+            [:limit or settings.TRENDING_PAGE_SIZE])
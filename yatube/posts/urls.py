@@ -5,6 +5,9 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending_posts, name='trending'),
+    path('search/', views.post_search, name='search'),
+    path('groups/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
@@ -18,4 +21,6 @@ urlpatterns = [
          name='profile_follow'),
     path('profile/<str:username>/unfollow/',
          views.profile_unfollow,
-         name='profile_unfollow')]
+         name='profile_unfollow'),
+    path('export/<str:dataset>/', views.export_own, name='export'),
+    path('export/all/<str:dataset>/', views.export_all, name='export_all')]
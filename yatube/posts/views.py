@@ -1,78 +1,174 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from .models import Post, Group, Follow, User
-from django.core.paginator import Paginator
 from .forms import PostForm, CommentForm
+from . import export, groups, search, suggestions, timeline, trending
+from .cache import feed_cache, feed_version, feed_versions
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from core.conditional import conditional_render, make_etag
+from core.db import serialized
+from core.decorators import query_budget
+from core.paginator import paginate
+
+
+def page_state(page_obj):
+    """Состояние страницы ленты для ETag.
+
+    Last-Modified эти страницы не отдают: от зрителя, подписки и числа
+    постов страница зависит так же, как от времени правки постов, и
+    If-Modified-Since без ETag отдавал бы устаревшее.
+    """
+    return (page_obj.token, page_obj.has_next(),
+            [(post.id, post.updated) for post in page_obj])
 
 
+def posts_count(user):
+    stats = getattr(user, 'stats', None)
+    return stats and stats.posts_count
+
+
+@query_budget(3)
 def index(request):
     temp = 'posts/index.html'
-    posts = Post.objects.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, posts)
     context = {
         'page_obj': page_obj,
+        **feed_cache('index', page_obj),
     }
     return render(request, temp, context)
 
 
+@query_budget(4)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     template = 'posts/group_list.html'
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = paginate(request, posts)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **feed_cache('group:%s' % group.id, page_obj),
+    }
+    state = page_state(page_obj)
+    etag = make_etag(request.user.pk, group.title, group.description, state)
+    return conditional_render(request, template, context, etag)
+
+
+@query_budget(2)
+def group_index(request):
+    """Каталог групп. Одна страница — одно чтение по индексу slug;
+    статистика считается одним запросом, только если фрагмент страницы
+    не найден в кэше. Ключ фрагмента меняется вместе с версиями лент
+    групп страницы, то есть при изменении их постов.
+    """
+    page_obj = paginate(request, groups.directory(),
+                        per_page=groups.PER_PAGE, ordering=('slug',))
+    page = list(page_obj)
+    versions = feed_versions('group:%s' % group.id for group in page)
+    state = [(group.id, group.slug, group.title,
+              versions['group:%s' % group.id]) for group in page]
+    context = {
+        'page_obj': page_obj,
+        'groups': groups.with_stats(Group.objects.filter(
+            pk__in=[group.id for group in page])).order_by('slug'),
+        'feed_cache_key': 'groups:%s' % make_etag(state),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
-    return render(request, template, context)
+    return render(request, 'posts/groups.html', context)
 
 
+@query_budget(5)
 def profile(request, username):
-    profile = get_object_or_404(User, username=username)
-    all_posts = profile.posts.all()
-    paginator = Paginator(all_posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = request.user.is_authenticated
-    if following:
+    profile = get_object_or_404(User.objects.select_related('stats'),
+                                username=username)
+    all_posts = profile.posts.select_related('author', 'group')
+    page_obj = paginate(request, all_posts)
+    following = False
+    suggested = []
+    if request.user.pk == profile.pk:
+        suggested = list(suggestions.for_user(profile))
+    elif request.user.is_authenticated:
         following = profile.following.filter(user=request.user).exists()
     context = {
         'page_obj': page_obj,
         'profile': profile,
         'all_posts': all_posts,
         'following': following,
+        'suggestions': suggested,
+        **feed_cache('profile:%s' % profile.id, page_obj),
+    }
+    state = page_state(page_obj)
+    etag = make_etag(request.user.pk, posts_count(profile), following,
+                     [(item.suggested_id, item.suggested.username,
+                       item.suggested.get_full_name())
+                      for item in suggested], state)
+    return conditional_render(request, 'posts/profile.html', context, etag)
+
+
+@query_budget(2)
+def trending_posts(request):
+    """Популярное: первые посты рейтинга update_trending."""
+    context = {
+        'posts': trending.top(),
+        'feed_cache_key': 'trending:%s' % feed_version('trending'),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
-    return render(request, 'posts/profile.html', context)
+    return render(request, 'posts/trending.html', context)
+
+
+@query_budget(3)
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search.search_page(query, request.GET)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@serialized
+def save_post(form, **fields):
+    """Сохраняет пост из формы. Картинка обрабатывается еще в
+    form.is_valid(), до блокировки записи.
+    """
+    post = form.save(commit=False)
+    for name, value in fields.items():
+        setattr(post, name, value)
+    post.save()
+    return post
 
 
 @login_required
+@query_budget(3)
 def post_create(request):
     form = PostForm(request.POST or None,
                     files=request.FILES or None)
 
     if form.is_valid():
-        post_object = form.save(commit=False)
-        post_object.author = request.user
-        post_object.save()
+        post_object = save_post(form, author=request.user)
         return redirect('posts:profile', post_object.author)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@query_budget(4)
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    if request.user != post.author:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post_id)
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form.save()
+        save_post(form)
         return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html',
                   {'form': form,
@@ -81,18 +177,26 @@ def post_edit(request, post_id):
                    'is_edit': True})
 
 
+@query_budget(4)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
     form = CommentForm()
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'form': form,
         'comments': comments}
-    return render(request, 'posts/post_detail.html', context)
+    created = [comment.created for comment in comments]
+    etag = make_etag(request.user.pk, post.id, post.updated,
+                     posts_count(post.author), str(post.group),
+                     len(created), max(created, default=None))
+    return conditional_render(request, 'posts/post_detail.html', context,
+                              etag)
 
 
 @login_required
+@serialized
 def add_comment(request, post_id):
     post = Post.objects.get(id=post_id)
     form = CommentForm(request.POST or None)
@@ -105,11 +209,9 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(4)
 def follow_index(request):
-    all_posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(all_posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = timeline.feed_paginator(request.user).get_page(request.GET)
     context = {
         'page_obj': page_obj,
     }
@@ -117,6 +219,7 @@ def follow_index(request):
 
 
 @login_required
+@serialized
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -125,8 +228,44 @@ def profile_follow(request, username):
 
 
 @login_required
+@serialized
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follower = get_object_or_404(Follow, user=request.user, author=author)
     follower.delete()
-    return redirect('posts:profile', follower.author)
+    return redirect('posts:profile', author)
+
+
+def export_response(request, dataset, user=None):
+    """Потоковая выгрузка: ?format=csv|ndjson, ?after=<id> для
+    продолжения прерванной загрузки, ?gzip=1 для сжатия на лету.
+    """
+    if dataset not in export.DATASETS:
+        raise Http404
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат')
+    after = request.GET.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            return HttpResponseBadRequest('after должен быть числом')
+    gzip = request.GET.get('gzip') == '1'
+    content_type = 'application/gzip' if gzip else export.FORMATS[fmt][0]
+    response = StreamingHttpResponse(
+        export.stream(dataset, fmt, user=user, after=after, gzip=gzip),
+        content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="%s"' % (
+        export.filename(dataset, fmt, gzip))
+    return response
+
+
+@login_required
+def export_own(request, dataset):
+    return export_response(request, dataset, user=request.user)
+
+
+@staff_member_required
+def export_all(request, dataset):
+    return export_response(request, dataset)
@@ -1,3 +1,4 @@
+import datetime
 import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -19,6 +20,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -26,10 +28,10 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,9 +39,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
@@ -108,11 +113,66 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Кэш общий для воркеров: LRU в памяти процесса перед файлом SQLite;
+# чужие изменения видны в процессе не позже чем через CHECK_INTERVAL с.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TwoLevelCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 2000,
+            'CHECK_INTERVAL': 1,
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+TEST_RUNNER = 'core.testing.TestRunner'
+# Сессии читаются из кэша; продление срока на каждом запросе пишется
+# в базу пачками (core.sessions), там же понемногу удаляются истекшие.
+SESSION_ENGINE = 'core.sessions'
+SESSION_SAVE_EVERY_REQUEST = True
+SESSION_FLUSH_SIZE = 200
+SESSION_FLUSH_INTERVAL = 30
+SESSION_PRUNE_BATCH = 500
 INTERNAL_IPS = [
     '127.0.0.1',
-] 
\ No newline at end of file
+]
+# Длина материализованной ленты подписок на пользователя и порог
+# подписчиков, выше которого посты автора не раскладываются по лентам,
+# а подмешиваются при чтении.
+TIMELINE_LENGTH = 1000
+TIMELINE_FANOUT_LIMIT = 10000
+# Время жизни кэша страниц лент; актуальность обеспечивают версии лент.
+FEED_CACHE_TIMEOUT = 60 * 5
+# Карточки постов кэшируются по id и времени изменения поста, поэтому
+# срок жизни можно держать большим.
+POST_CARD_TIMEOUT = 60 * 60 * 24
+# Потоки фоновой генерации миниатюр картинок постов.
+THUMBNAIL_WORKERS = 2
+# Параметры каждого соединения с SQLite: WAL, чтобы чтение не ждало
+# записи, и ожидание блокировки вместо немедленной ошибки.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'busy_timeout': 5000,
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'memory',
+}
+# Транзакции записи из view выполняются по одной (core.db.write_lock)
+# и повторяются, если база все же оказалась заблокирована.
+SQLITE_SERIALIZE_WRITES = True
+SQLITE_WRITE_RETRIES = 5
+# Картинки постов больше этого числа пикселей отклоняются до декодирования.
+IMAGE_MAX_PIXELS = 40 * 10 ** 6
+# Адрес сайта для ссылок в письмах, которые отправляются не из запроса.
+SITE_URL = 'http://127.0.0.1:8000'
+# За какой период собирается первый дайджест подписок пользователя.
+DIGEST_PERIOD = datetime.timedelta(days=1)
+# Рейтинг популярного (update_trending): вес комментария уменьшается вдвое
+# за TRENDING_HALF_LIFE; пост выпадает, когда его оценка падает ниже
+# TRENDING_MIN_SCORE, и в таблице хранится не больше TRENDING_SIZE постов.
+TRENDING_HALF_LIFE = datetime.timedelta(hours=6)
+TRENDING_MIN_SCORE = 0.05
+TRENDING_SIZE = 500
+TRENDING_PAGE_SIZE = 20